@@ -1,15 +1,37 @@
-import pandas as pd
-from flask import Flask, render_template, url_for, make_response, request
+import functools
+import os
+import time
+
+from flask import Flask, Response, g, redirect, render_template, url_for, request
 from flask_caching import Cache
-from deep_translator import GoogleTranslator
 
 from services.database import (
+    pool,
     get_db,
     close_connection,
     fetch_trials_paginated,
+    fetch_trials_by_ids,
+    fetch_filtered_ids,
     fetch_unique_options,
+    fetch_facet_values,
+)
+from services.export import EXPORT_FORMATS, select_columns, stream_export
+from services.facets import FACET_KEYS
+from services.lexical import fetch_bm25
+from services.caching import TieredCache, source_version
+from services.neighbors import NEIGHBORS_K
+from services.metrics import (
+    render_metrics,
+    request_duration,
+    server_timing_header,
+    start_request,
+    timed,
 )
-from services.search import search_engine
+from services.profiler import SamplingProfiler
+from services.results import ResultSet
+from services.search import SEARCH_MODES, search_warmup
+from services.stats import PHASES, fetch_stats, has_active_filters, timeline_chart
+from services.translation import get_translator
 from utils.dictionaries import (
     phases_map,
     statuses_map,
@@ -17,46 +39,224 @@ from utils.dictionaries import (
     types_map,
     age_map,
     statuses_colors_map,
+    sentiments_map,
 )
-from utils.formatters import (
-    clean_text,
-    translate_complex_text,
-    clean_locations,
-    get_sentiment_info,
-)
+from utils.formatters import translate_complex_text
 
 config = {
     "DEBUG": True,
     "CACHE_TYPE": "FileSystemCache",
     "CACHE_DIR": "cache-directory",
-    "CACHE_DEFAULT_TIMEOUT": 300,
+    "CACHE_THRESHOLD": 5000,
 }
 
+# Profilowanie pojedynczych żądań parametrem ?profile=1 (tylko po włączeniu)
+PROFILE_REQUESTS = os.environ.get("PROFILE_REQUESTS", "0") == "1"
+
+# Limity wyszukiwania wsadowego (/search/batch)
+MAX_BATCH_QUERIES = int(os.environ.get("MAX_BATCH_QUERIES", 5000))
+MAX_BATCH_TOP_N = 1000
+
 app = Flask(__name__)
 app.config.from_mapping(config)
 cache = Cache(app)
 
+# Wersja kodu i szablonów (lub APP_VERSION nadana przy wdrożeniu)
+APP_VERSION = os.environ.get("APP_VERSION") or source_version(app.root_path)
+
+
+def cache_version():
+    """Wersja zapisanych wyników: kod aplikacji oraz ustawienia i osadzenia silnika"""
+    search_engine = search_warmup.engine
+    engine_version = search_engine.version if search_engine is not None else "warmup"
+
+    return f"{APP_VERSION}-{engine_version}"
+
+
+# Wyniki pośrednie i strony: LRU procesu przed współdzielonym cache na dysku
+results_cache = TieredCache(cache, version=cache_version)
+
 app.teardown_appcontext(close_connection)
 
 
+def warming_up():
+    """Wyniki zależne od silnika nie są zapisywane w cache przed jego rozgrzaniem"""
+    return not search_warmup.ready
+
+
+def cached_view(view):
+    """Zapisuje odpowiedź widoku pod kanonicznym kluczem parametrów żądania
+
+    Odpowiedzi z błędem (krotki ze statusem) nie są zapisywane.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if warming_up():
+            return view(*args, **kwargs)
+
+        params = {
+            key: request.args.getlist(key) for key in request.args if key != "profile"
+        }
+
+        return results_cache.get_or_compute(
+            f"view:{request.endpoint}",
+            params,
+            lambda: view(*args, **kwargs),
+            store=lambda response: not isinstance(response, tuple),
+        )
+
+    return wrapper
+
+
+@app.before_request
+def start_warmup():
+    # Silnik wyszukiwania ładuje się w tle od pierwszego żądania procesu
+    # (również w procesach roboczych po fork); do tego czasu wyszukiwanie
+    # działa po słowach
+    search_warmup.start()
+
+
+@app.before_request
+def start_timing():
+    start_request()
+    g.request_start = time.perf_counter()
+
+    if PROFILE_REQUESTS and request.args.get("profile") == "1":
+        g.profiler = SamplingProfiler()
+        g.profiler.start()
+
+
+@app.after_request
+def record_timing(response):
+    total = time.perf_counter() - g.request_start
+    endpoint = request.endpoint or "unknown"
+
+    request_duration.observe(endpoint, total)
+    response.headers["Server-Timing"] = server_timing_header(total)
+
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.stop()
+        response.headers["X-Profile"] = profiler.save(endpoint)
+
+    return response
+
+
 @app.context_processor
 def utility_processor():
-    def url_replace(**kwargs):
-        args = request.args.copy()
+    def url_with(endpoint, **kwargs):
+        # Zachowanie wszystkich wartości parametrów wielokrotnych (np. kilku statusów)
+        args = request.args.to_dict(flat=False)
+        args.update(kwargs)
 
-        for key, value in kwargs.items():
-            args[key] = value
+        return url_for(endpoint, **args)
 
-        return url_for(request.endpoint, **args)
+    def url_replace(**kwargs):
+        return url_with(request.endpoint, **kwargs)
 
     def get_status_class(status_key):
         return statuses_colors_map.get(status_key, "is-white border-grey")
 
-    return dict(url_replace=url_replace, get_status_class=get_status_class)
+    return dict(
+        url_with=url_with, url_replace=url_replace, get_status_class=get_status_class
+    )
+
+
+def get_filters():
+    """Odczytuje zapytanie i filtry z parametrów żądania"""
+    return {
+        "q": request.args.get("q", ""),
+        "status": request.args.getlist("status"),
+        "phase": request.args.getlist("phase"),
+        "type": request.args.getlist("type"),
+        "age": request.args.getlist("age"),
+        "sex": request.args.getlist("sex"),
+    }
+
+
+def get_result_set(conn, filters):
+    """Zwraca zapisany zbiór wyników zapytania lub wylicza go jednorazowo"""
+    search_engine = search_warmup.engine
+
+    # Silnik jeszcze się rozgrzewa - tymczasowe wyniki z indeksu pełnotekstowego
+    if search_engine is None:
+        matches = fetch_bm25(conn, filters["q"], filters=filters)
+        return ResultSet([m[0] for m in matches], [m[1] for m in matches])
+
+    def compute():
+        # Filtry nakładane są w silniku przed wyborem najlepszych wyników
+        ids, scores, facet_counts = search_engine.search_with_facets(
+            filters["q"], filters=filters
+        )
+        result_set = ResultSet(ids, scores, facet_counts)
+
+        # Bez map bitowych ranking zawężany jest zapytaniem SQL
+        if search_engine.facets is None and any(
+            value for key, value in filters.items() if key != "q"
+        ):
+            result_set = result_set.filtered(fetch_filtered_ids(conn, filters, ids))
+
+        return result_set.to_dict()
+
+    # Zbiór wyników nie zależy od numeru strony ani kolejności parametrów
+    return ResultSet.from_dict(
+        results_cache.get_or_compute("result_set", filters, compute)
+    )
+
+
+def fetch_page(conn, filters, page, per_page):
+    """Pobiera stronę wyników: według rankingu dla zapytań, inaczej według filtrów"""
+    if not filters["q"]:
+        trials_data, total_pages, total_results = results_cache.get_or_compute(
+            "filter_page",
+            dict(filters, page=page, per_page=per_page),
+            lambda: fetch_trials_paginated(conn, filters, [], page, per_page),
+        )
+
+        # Wiersze są modyfikowane przy formatowaniu, więc zwracane są kopie
+        return [dict(r) for r in trials_data], total_pages, total_results
+
+    result_set = get_result_set(conn, filters)
+    trials_data = fetch_trials_by_ids(conn, result_set.page_ids(page, per_page))
+
+    return trials_data, result_set.total_pages(per_page), len(result_set)
+
+
+def get_filter_options(conn, filters):
+    """Zwraca opcje filtrów oraz liczby wyników dla bieżącego wyszukiwania"""
+    search_engine = search_warmup.engine
+    facets = search_engine.facets if search_engine is not None else None
+
+    if facets is None:
+        options = {
+            "status": fetch_unique_options(conn, "Study Status"),
+            "phase": fetch_facet_values(conn, "phase"),
+            "type": fetch_unique_options(conn, "Study Type"),
+            "sex": fetch_unique_options(conn, "Sex"),
+        }
+        counts = None
+    else:
+        options = {key: facets.values(key) for key in FACET_KEYS}
+
+        if filters["q"]:
+            counts = get_result_set(conn, filters).facet_counts
+        else:
+            counts = facets.counts(filters)
+
+    # Posortowanie statusów
+    options["status"] = sorted(
+        options["status"], key=lambda x: statuses_map.get(x, x).lower()
+    )
+
+    # Opcje wieków
+    options["age"] = ["CHILD", "ADULT", "OLDER_ADULT"]
+
+    return options, counts
 
 
 @app.route("/")
-@cache.cached(timeout=60, query_string=True)
+@cached_view
 def index():
     conn = get_db()
 
@@ -66,25 +266,16 @@ def index():
     per_page = 20
 
     suggestion = None
-    if query_text:
-        suggestion = search_engine.get_suggestion(query_text)
+    if query_text and search_warmup.ready:
+        with timed("suggest"):
+            suggestion = search_warmup.engine.get_suggestion(query_text)
 
     # Filtry
-    filters = {
-        "q": query_text,
-        "status": request.args.getlist("status"),
-        "phase": request.args.getlist("phase"),
-        "type": request.args.getlist("type"),
-        "age": request.args.getlist("age"),
-        "sex": request.args.getlist("sex"),
-    }
+    filters = get_filters()
 
-    # Wyszukiwarka dla tekstów
-    matching_ids = search_engine.get_relevant_ids(query_text) if query_text else []
-
-    # Pobranie danych z bazy
-    trials_data, total_pages, total_results = fetch_trials_paginated(
-        conn, filters, matching_ids, page, per_page
+    # Pobranie danych z bazy (ranking zapytania jest liczony raz i zapisywany)
+    trials_data, total_pages, total_results = fetch_page(
+        conn, filters, page, per_page
     )
 
     # Sformatowanie wyników do wyświetlenia
@@ -102,246 +293,348 @@ def index():
         r["Age"] = translate_complex_text(r.get("Age", ""), age_map)
         r["Sex"] = translate_complex_text(r.get("Sex", ""), sex_map)
 
-        # Oczyszczenie i sformatowanie list
-        r["Interventions"] = clean_text(r.get("Interventions", ""))
-        r["Locations"] = clean_locations(r.get("Locations", ""))
-        r["Conditions"] = clean_text(r.get("Conditions", ""))
+        # Listy oczyszczone podczas inicjalizacji bazy
+        r["Interventions"] = r.get("Interventions Clean", "")
+        r["Locations"] = r.get("Countries", "")
+        r["Conditions"] = r.get("Conditions Clean", "")
 
         # Pobranie opisu
         r["Brief Summary"] = r.get("Brief Summary", "") or "Brak szczegółowego opisu"
 
-        # Ocenienie badań
-        r["Sentiment"] = get_sentiment_info(r.get("Brief Summary", ""))
+        # Ocena badania wyliczona podczas inicjalizacji bazy
+        r["Sentiment"] = sentiments_map.get(r.get("Sentiment"))
 
         trials.append(r)
 
-    # Posortowanie statusów
-    statuses_raw = fetch_unique_options(conn, "Study Status")
-    statuses_raw = sorted(statuses_raw, key=lambda x: statuses_map.get(x, x).lower())
+    # Opcje filtrów wraz z licznościami
+    options, facet_counts = get_filter_options(conn, filters)
+
+    with timed("render"):
+        return render_template(
+            "index.html",
+            trials=trials,
+            statuses=options["status"],
+            phases=options["phase"],
+            types=options["type"],
+            ages=options["age"],
+            sexes=options["sex"],
+            facet_counts=facet_counts,
+            suggestion=suggestion,
+            lexical_only=bool(query_text) and not search_warmup.ready,
+            current_q=query_text,
+            current_status=filters["status"],
+            current_phase=filters["phase"],
+            current_type=filters["type"],
+            current_age=filters["age"],
+            current_sex=filters["sex"],
+            statuses_map=statuses_map,
+            phases_map=phases_map,
+            types_map=types_map,
+            age_map=age_map,
+            sex_map=sex_map,
+            page=page,
+            total_pages=total_pages,
+            total_results=total_results,
+        )
 
-    # Rozdzielenie opcji dla faz
-    raw_phases = fetch_unique_options(conn, "Phases")
-    unique_phases = set()
 
-    for p in raw_phases:
-        for part in p.replace("/", "|").split("|"):
-            if part.strip():
-                unique_phases.add(part.strip())
+@app.route("/facets")
+@cached_view
+def facets():
+    """Liczby wyników dla wartości filtrów (JSON)"""
+    conn = get_db()
+    filters = get_filters()
+    options, counts = get_filter_options(conn, filters)
+
+    if counts is None:
+        return {"error": "Liczności filtrów są niedostępne"}, 503
+
+    if filters["q"]:
+        total = len(get_result_set(conn, filters))
+    else:
+        facet_index = search_warmup.engine.facets
+        mask = facet_index.mask(filters)
+        total = facet_index.n_rows if mask is None else int(mask.sum())
+
+    labels = {
+        "status": statuses_map,
+        "phase": phases_map,
+        "type": types_map,
+        "age": age_map,
+        "sex": sex_map,
+    }
 
-    phases_raw = sorted(list(unique_phases))
+    return {
+        "total": total,
+        "facets": {
+            key: [
+                {
+                    "value": value,
+                    "label": labels[key].get(value, value),
+                    "count": counts.get(key, {}).get(value, 0),
+                }
+                for value in values
+            ]
+            for key, values in options.items()
+        },
+    }
 
-    # Pobranie pozostałych filtrów
-    types_raw = fetch_unique_options(conn, "Study Type")
-    sex_raw = fetch_unique_options(conn, "Sex")
 
-    # Opcje wieków
-    age_raw = ["CHILD", "ADULT", "OLDER_ADULT"]
-
-    return render_template(
-        "index.html",
-        trials=trials,
-        statuses=statuses_raw,
-        phases=phases_raw,
-        types=types_raw,
-        ages=age_raw,
-        sexes=sex_raw,
-        suggestion=suggestion,
-        current_q=query_text,
-        current_status=filters["status"],
-        current_phase=filters["phase"],
-        current_type=filters["type"],
-        current_age=filters["age"],
-        current_sex=filters["sex"],
-        statuses_map=statuses_map,
-        phases_map=phases_map,
-        types_map=types_map,
-        age_map=age_map,
-        sex_map=sex_map,
-        page=page,
-        total_pages=total_pages,
-        total_results=total_results,
+def valid_filters(filters):
+    """Filtry zapytania wsadowego: wartości to tekst albo lista tekstów"""
+    return isinstance(filters, dict) and all(
+        isinstance(values, str)
+        or (isinstance(values, list) and all(isinstance(v, str) for v in values))
+        for values in filters.values()
     )
 
 
-@app.route("/stats")
-@cache.cached(timeout=600)
-def stats():
-    conn = get_db()
+@app.route("/search/batch", methods=["POST"])
+def search_batch():
+    """Wyszukiwanie wielu zapytań w jednym żądaniu (JSON)
+
+    Treść: {"queries": [tekst lub {"q": ..., "filters": {...}}], "filters": {...},
+    "top_n": 100, "mode": "semantic"}. Filtry zapytania zastępują wspólne filtry;
+    wartości filtrów to tekst albo lista tekstów, a tryb to "semantic" (domyślny),
+    "lexical" lub "hybrid".
+    Wyniki ("scores") to podobieństwo cosinusowe, również w trybie "hybrid".
+    """
+    data = request.get_json(silent=True)
+
+    if not isinstance(data, dict) or not isinstance(data.get("queries"), list):
+        return {"error": "Błędne dane"}, 400
+
+    if len(data["queries"]) > MAX_BATCH_QUERIES:
+        return {"error": f"Maksymalnie {MAX_BATCH_QUERIES} zapytań"}, 400
+
+    search_engine = search_warmup.engine
+
+    if search_engine is None:
+        return {"error": "Silnik wyszukiwania jeszcze się rozgrzewa"}, 503
 
-    # 1. Wykres: Dynamika rozpoczętych badań
     try:
-        df_time = pd.read_sql('SELECT "Start Date", "Study Type" FROM trials', conn)
-        df_time["Start Date"] = pd.to_datetime(df_time["Start Date"], errors="coerce")
-        df_time["Year"] = df_time["Start Date"].dt.year
-        df_time["Simple Type"] = df_time["Study Type"].map(
-            lambda x: types_map.get(x, x)
+        top_n = min(int(data.get("top_n", 100)), MAX_BATCH_TOP_N)
+    except (TypeError, ValueError):
+        return {"error": "Błędna wartość top_n"}, 400
+
+    if top_n < 1:
+        return {"error": "Błędna wartość top_n"}, 400
+
+    mode = data.get("mode", "semantic")
+
+    if mode not in SEARCH_MODES:
+        return {"error": f"Dozwolone tryby: {', '.join(SEARCH_MODES)}"}, 400
+
+    common_filters = data.get("filters") or {}
+    queries, query_filters = [], []
+
+    if not valid_filters(common_filters):
+        return {"error": "Błędne dane"}, 400
+
+    for item in data["queries"]:
+        if isinstance(item, dict):
+            text, filters = item.get("q", ""), item.get("filters") or common_filters
+        else:
+            text, filters = item, common_filters
+
+        if not isinstance(text, str) or not valid_filters(filters):
+            return {"error": "Błędne dane"}, 400
+
+        queries.append(text)
+        query_filters.append(
+            {
+                key: [values] if isinstance(values, str) else list(values)
+                for key, values in filters.items()
+                if key in FACET_KEYS
+            }
         )
 
-        current_year = pd.Timestamp.now().year
-        df_time = df_time[
-            (df_time["Year"] > 1950) & (df_time["Year"] <= current_year + 5)
+    results = search_engine.search_batch(
+        queries, top_n, filters=query_filters, mode=mode
+    )
+
+    # Bez map bitowych wyniki zawężane są zapytaniem SQL
+    if search_engine.facets is None:
+        conn = get_db()
+
+        for i, filters in enumerate(query_filters):
+            if any(filters.values()):
+                result_set = ResultSet(*results[i]).filtered(
+                    fetch_filtered_ids(conn, dict(filters, q=queries[i]), results[i][0])
+                )
+                results[i] = (result_set.ids, result_set.scores)
+
+    return {
+        "results": [
+            {"query": text, "ids": ids, "scores": scores}
+            for text, (ids, scores) in zip(queries, results)
         ]
+    }
 
-        # Główne dane
-        timeline_counts = df_time["Year"].value_counts().sort_index()
-        timeline_labels = [str(int(y)) for y in timeline_counts.index.tolist()]
-        timeline_values = timeline_counts.values.tolist()
 
-        # Szczegółowe dane
-        timeline_details = {}
-        grouped = df_time.groupby(["Year", "Simple Type"]).size().unstack(fill_value=0)
+@app.route("/similar/<nct_id>")
+def similar(nct_id):
+    """Badania podobne do wskazanego (JSON, z grafu najbliższych sąsiadów)"""
+    search_engine = search_warmup.engine
 
-        for year in timeline_counts.index:
-            year_str = str(int(year))
+    if search_engine is None:
+        return {"error": "Silnik wyszukiwania jeszcze się rozgrzewa"}, 503
 
-            if year in grouped.index:
-                timeline_details[year_str] = grouped.loc[year].to_dict()
-            else:
-                timeline_details[year_str] = {}
+    top_n = min(request.args.get("top_n", 10, type=int), NEIGHBORS_K)
+    result = search_engine.similar(nct_id.upper(), top_n)
 
+    if result is None:
+        return {"error": "Nie znaleziono badania"}, 404
+
+    ids, scores = result
+    scores = dict(zip(ids, scores))
+
+    return {
+        "nct": nct_id.upper(),
+        "similar": [
+            {
+                "id": row["NCT Number"],
+                "title": row.get("Study Title", ""),
+                "status": statuses_map.get(row.get("Study Status"), ""),
+                "score": scores[row["NCT Number"]],
+            }
+            for row in fetch_trials_by_ids(get_db(), ids)
+        ],
+    }
+
+
+@app.route("/healthz")
+def healthz():
+    """Proces aplikacji działa (niezależnie od stanu silnika wyszukiwania)"""
+    return {"status": "ok"}
+
+
+@app.route("/readyz")
+def readyz():
+    """Stan rozgrzewania silnika wyszukiwania semantycznego"""
+    status = search_warmup.status()
+
+    return status, 200 if search_warmup.ready else 503
+
+
+@app.route("/metrics")
+def metrics():
+    """Metryki w formacie Prometheus"""
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/stats")
+@cached_view
+def stats():
+    conn = get_db()
+
+    # Filtry (te same co w wyszukiwarce)
+    query_text = request.args.get("q", "")
+    filters = get_filters()
+    matching_ids = get_result_set(conn, filters).ids if query_text else []
+
+    try:
+        data = fetch_stats(conn, filters, matching_ids)
     except Exception:
-        timeline_labels = []
-        timeline_values = []
-        timeline_details = {}
+        data = {"timeline": [], "phases": [], "enrollment": [], "conditions": []}
+
+    # 1. Wykres: Dynamika rozpoczętych badań
+    timeline_labels, timeline_values, timeline_details = timeline_chart(
+        data["timeline"], types_map
+    )
 
     # 2. Wykres: Liczebność faz badań
-    phases = ["EARLY_PHASE1", "PHASE1", "PHASE2", "PHASE3", "PHASE4"]
-    phase_labels = [phases_map.get(p, p) for p in phases]
-    phase_values = []
-
-    for p in phases:
-        try:
-            res = pd.read_sql(
-                f"SELECT COUNT(*) FROM trials WHERE Phases LIKE '%{p}%'", conn
-            )
-            phase_values.append(int(res.iloc[0, 0]))
-        except Exception:
-            phase_values.append(0)
+    phase_labels = [phases_map.get(p, p) for p in PHASES]
+    phase_counts = dict(data["phases"])
+    phase_values = [phase_counts.get(p, 0) for p in PHASES]
 
     # 3. Wykres: Wielkość grup badawczych
     enrollment_labels = ["Małe (<100)", "Średnie (100-500)", "Duże (>500)"]
-    enrollment_values = [0, 0, 0]
-
-    try:
-        df_enroll = pd.read_sql("SELECT Enrollment FROM trials", conn)
-        df_enroll["Enrollment"] = pd.to_numeric(
-            df_enroll["Enrollment"], errors="coerce"
-        )
-        df_enroll = df_enroll.dropna()
-
-        enrollment_values[0] = len(df_enroll[df_enroll["Enrollment"] < 100])
-        enrollment_values[1] = len(
-            df_enroll[
-                (df_enroll["Enrollment"] >= 100) & (df_enroll["Enrollment"] <= 500)
-            ]
-        )
-        enrollment_values[2] = len(df_enroll[df_enroll["Enrollment"] > 500])
-    except Exception:
-        enrollment_values = [0, 0, 0]
+    enrollment_counts = dict(data["enrollment"])
+    enrollment_values = [enrollment_counts.get(i, 0) for i in range(3)]
 
     # 4. Wykres: Najczęściej badane schorzenia
-    try:
-        df_conditions = pd.read_sql("SELECT Conditions FROM trials", conn)
-        top_conditions = (
-            df_conditions["Conditions"]
-            .str.split("|")
-            .explode()
-            .str.strip()
-            .value_counts()
-            .head(10)
+    conditions_labels = [row[0] for row in data["conditions"]]
+    conditions_values = [row[1] for row in data["conditions"]]
+
+    with timed("render"):
+        return render_template(
+            "stats.html",
+            timeline_labels=timeline_labels,
+            timeline_values=timeline_values,
+            timeline_details=timeline_details,
+            phase_labels=phase_labels,
+            phase_values=phase_values,
+            enrollment_labels=enrollment_labels,
+            enrollment_values=enrollment_values,
+            conditions_labels=conditions_labels,
+            conditions_values=conditions_values,
+            is_filtered=has_active_filters(filters),
         )
 
-        conditions_labels = top_conditions.index.tolist()
-        conditions_values = top_conditions.values.tolist()
-    except Exception:
-        conditions_labels = []
-        conditions_values = []
-
-    return render_template(
-        "stats.html",
-        timeline_labels=timeline_labels,
-        timeline_values=timeline_values,
-        timeline_details=timeline_details,
-        phase_labels=phase_labels,
-        phase_values=phase_values,
-        enrollment_labels=enrollment_labels,
-        enrollment_values=enrollment_values,
-        conditions_labels=conditions_labels,
-        conditions_values=conditions_values,
-    )
-
 
 @app.route("/translate", methods=["POST"])
-@cache.cached(timeout=3600, make_cache_key=lambda: str(request.get_json()))
 def translate_text():
     """Tłumaczy tekst z karty"""
     data = request.get_json()
 
+    if not isinstance(data, dict) or not isinstance(data.get("batch"), dict):
+        return {"error": "Błędne dane"}, 400
+
     try:
-        translator = GoogleTranslator(source="auto", target="pl")
+        translator = get_translator()
     except Exception:
         return {"error": "Błąd inicjalizacji tłumacza"}, 500
 
-    if isinstance(data, dict) and "batch" in data:
-        results = {}
-
-        for key, text in data["batch"].items():
-            if text and isinstance(text, str) and len(text.strip()) > 1:
-                try:
-                    results[key] = translator.translate(text[:5000])
-                except Exception as e:
-                    print(f"Błąd tłumaczenia pola {key}: {e}")
-                    results[key] = text
-            else:
-                results[key] = text
-        return {"translated_batch": results}
+    return {"translated_batch": translator.translate_batch(data["batch"], "pl")}
 
-    return {"error": "Błędne dane"}, 400
 
-
-@app.route("/export_csv")
-def export_csv():
+@app.route("/export")
+def export():
+    """Eksportuje wszystkie wyniki wyszukiwania strumieniowo (CSV, NDJSON, Parquet)"""
     conn = get_db()
 
-    # Główne parametry
-    page = request.args.get("page", 1, type=int)
-    per_page = 20
-    query_text = request.args.get("q", "")
-
-    # Filtry
-    filters = {
-        "q": query_text,
-        "status": request.args.getlist("status"),
-        "phase": request.args.getlist("phase"),
-        "type": request.args.getlist("type"),
-        "age": request.args.getlist("age"),
-        "sex": request.args.getlist("sex"),
-    }
-
-    # Pobranie identycznego ID
-    matching_ids = search_engine.get_relevant_ids(query_text) if query_text else []
+    export_format = request.args.get("format", "csv")
+
+    if export_format not in EXPORT_FORMATS:
+        return "Nieobsługiwany format eksportu", 400
+
+    # Filtry oraz wybrane kolumny (parametr columns, oddzielone przecinkami)
+    filters = get_filters()
+    requested = [
+        col.strip()
+        for value in request.args.getlist("columns")
+        for col in value.split(",")
+        if col.strip()
+    ]
+    columns = select_columns(conn, requested)
+
+    # Dla zapytań eksport zachowuje kolejność rankingu
+    ranked_ids = get_result_set(conn, filters).ids if filters["q"] else None
+
+    # Generator działa po zakończeniu kontekstu żądania, dlatego pobiera
+    # połączenie bieżącego wątku bezpośrednio z puli
+    def generate():
+        yield from stream_export(
+            pool.connection(), export_format, filters, columns, ranked_ids
+        )
 
-    # Pobranie bieżącej strony
-    trials_data, _, _ = fetch_trials_paginated(
-        conn, filters, matching_ids, page, per_page
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    response = Response(generate(), mimetype=mimetype)
+    response.headers["Content-Disposition"] = (
+        f"attachment; filename=clinical_trials.{extension}"
     )
 
-    if not trials_data:
-        return "Brak danych do eksportu", 404
-
-    # Stworzenie ramki danych
-    df = pd.DataFrame(trials_data)
+    return response
 
-    # Wygenerowanie pliku CSV
-    csv_data = df.to_csv(index=False, encoding="utf-8-sig")
 
-    response = make_response(csv_data)
-    response.headers["Content-Disposition"] = (
-        f"attachment; filename=clinical_trials_page_{page}.csv"
-    )
-    response.headers["Content-type"] = "text/csv"
+@app.route("/export_csv")
+def export_csv():
+    """Dawny adres eksportu CSV (przekierowanie na /export?format=csv)"""
+    args = request.args.to_dict(flat=False)
+    args["format"] = "csv"
 
-    return response
+    return redirect(url_for("export", **args), code=301)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,95 @@
+import random
+import sqlite3
+import statistics
+import sys
+import time
+
+from services.database import (
+    DATABASE,
+    ConnectionPool,
+    fetch_trials_by_ids,
+    fetch_trials_paginated,
+)
+
+# Zestawy filtrów odpowiadające typowym żądaniom strony wyników
+SAMPLE_FILTERS = [
+    {},
+    {"status": ["RECRUITING"]},
+    {"status": ["COMPLETED", "TERMINATED"], "type": ["INTERVENTIONAL"]},
+    {"phase": ["PHASE3"]},
+    {"phase": ["PHASE2", "PHASE3"], "sex": ["FEMALE"]},
+    {"age": ["CHILD"], "status": ["RECRUITING"]},
+]
+
+
+def simulate_request(conn, filters, ids):
+    """Zapytania wykonywane przez jedno żądanie strony wyników"""
+    fetch_trials_paginated(conn, filters, [], 1, 20)
+    fetch_trials_by_ids(conn, random.sample(ids, min(20, len(ids))))
+
+
+def per_request_connection(filters, ids):
+    """Dotychczasowy sposób: nowe połączenie z domyślnymi ustawieniami"""
+    conn = sqlite3.connect(DATABASE)
+    conn.row_factory = sqlite3.Row
+    simulate_request(conn, filters, ids)
+    conn.close()
+
+
+def measure(name, handler, n_requests):
+    timings = []
+
+    for i in range(n_requests):
+        filters = SAMPLE_FILTERS[i % len(SAMPLE_FILTERS)]
+        start = time.perf_counter()
+        handler(filters)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    first = timings[0]
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(
+        f"{name:<16} pierwsze={first:.2f} "
+        f"mediana={statistics.median(timings):.2f} p95={p95:.2f} "
+        f"średnio={statistics.fmean(timings):.2f} ms/żądanie"
+    )
+
+
+def main(n_requests=500):
+    random.seed(0)
+
+    conn = sqlite3.connect(DATABASE)
+    ids = [row[0] for row in conn.execute('SELECT "NCT Number" FROM trials')]
+    conn.close()
+
+    pool = ConnectionPool()
+
+    # Sam koszt uzyskania połączenia
+    start = time.perf_counter()
+    for _ in range(n_requests):
+        sqlite3.connect(DATABASE).close()
+    connect_ms = (time.perf_counter() - start) * 1000 / n_requests
+
+    pool.connection()
+    start = time.perf_counter()
+    for _ in range(n_requests):
+        pool.connection()
+    pool_ms = (time.perf_counter() - start) * 1000 / n_requests
+
+    print(f"Otwarcie połączenia: {connect_ms:.3f} ms, pobranie z puli: {pool_ms:.3f} ms")
+
+    measure(
+        "nowe połączenie",
+        lambda filters: per_request_connection(filters, ids),
+        n_requests,
+    )
+    measure(
+        "pula połączeń",
+        lambda filters: simulate_request(pool.connection(), filters, ids),
+        n_requests,
+    )
+
+
+if __name__ == "__main__":
+    # Opcjonalna liczba żądań: python -m benchmarks.db_connections 1000
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
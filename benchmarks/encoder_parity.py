@@ -0,0 +1,129 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.run import QUERIES, summarize
+from services.embeddings import MODEL_NAME
+from services.encoder import (
+    OnnxEncoder,
+    SentenceTransformerEncoder,
+    TorchInt8Encoder,
+)
+from services.store import EmbeddingStore
+
+# Dodatkowe zapytania w stylu profili pacjentów (dłuższe teksty)
+PROFILE_QUERIES = [
+    "65 year old woman with HER2 positive metastatic breast cancer after trastuzumab",
+    "child with newly diagnosed acute lymphoblastic leukemia",
+    "adult with type 2 diabetes and chronic kidney disease on metformin",
+    "patient with heart failure and atrial fibrillation after myocardial infarction",
+    "pacjent z rakiem płuca po chemioterapii",
+]
+
+# Progi zgodności z modelem bazowym
+MIN_COSINE = 0.99
+MIN_OVERLAP = 0.9
+TOP_N = 100
+
+STORE_PATH = os.path.join("models", "embeddings.bin")
+
+
+def encode_queries(encoder, queries):
+    return np.asarray(
+        [encoder.encode(f"query: {q}", normalize_embeddings=True) for q in queries]
+    )
+
+
+def latency(encoder, queries, repeat):
+    """Czas kodowania pojedynczego zapytania (po rozgrzewce)"""
+    encoder.encode(f"query: {queries[0]}", normalize_embeddings=True)
+    timings = []
+
+    for i in range(repeat):
+        start = time.perf_counter()
+        encoder.encode(f"query: {queries[i % len(queries)]}", normalize_embeddings=True)
+        timings.append(time.perf_counter() - start)
+
+    return summarize(timings)
+
+
+def compare(base_vecs, vecs, store):
+    """Zgodność cosinusowa i pokrycie top-N wyników z modelem bazowym"""
+    cosines = np.sum(base_vecs * vecs, axis=1)
+    overlaps = []
+
+    if store is not None:
+        for base_vec, vec in zip(base_vecs, vecs):
+            base_rows = set(store.top_k_sharded(base_vec, TOP_N)[0].tolist())
+            rows = set(store.top_k_sharded(vec, TOP_N)[0].tolist())
+            overlaps.append(len(base_rows & rows) / max(len(base_rows), 1))
+
+    return {
+        "cosine_min": float(cosines.min()),
+        "cosine_mean": float(cosines.mean()),
+        "overlap_min": min(overlaps) if overlaps else None,
+        "overlap_mean": float(np.mean(overlaps)) if overlaps else None,
+    }
+
+
+def main():
+    # python -m benchmarks.encoder_parity --backends torch-int8 onnx
+    parser = argparse.ArgumentParser(description="Zgodność i szybkość koderów zapytań")
+    parser.add_argument("--backends", nargs="+", default=["torch-int8", "onnx"])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(MODEL_NAME)
+    base = SentenceTransformerEncoder(model)
+    queries = QUERIES + PROFILE_QUERIES
+    store = EmbeddingStore.open(STORE_PATH) if os.path.exists(STORE_PATH) else None
+
+    if store is None:
+        print(f"Brak {STORE_PATH} - pominięto pokrycie top-{TOP_N}")
+
+    base_vecs = encode_queries(base, queries)
+    stats = latency(base, queries, args.repeat)
+    print(f"{base.name:<22} p50={stats['p50_ms']:.2f} p95={stats['p95_ms']:.2f} ms")
+
+    factories = {
+        "torch-int8": lambda: TorchInt8Encoder(model),
+        "onnx": OnnxEncoder,
+        "onnx-fp32": lambda: OnnxEncoder(model_file="model.onnx"),
+    }
+    failed = False
+
+    for name in args.backends:
+        try:
+            encoder = factories[name]()
+        except Exception as e:
+            print(f"{name:<22} niedostępny: {e}")
+            continue
+
+        parity = compare(base_vecs, encode_queries(encoder, queries), store)
+        stats = latency(encoder, queries, args.repeat)
+        ok = parity["cosine_min"] >= MIN_COSINE and (
+            parity["overlap_min"] is None or parity["overlap_min"] >= MIN_OVERLAP
+        )
+        failed = failed or not ok
+        overlap = (
+            f"top-{TOP_N} min={parity['overlap_min']:.3f} "
+            f"średnio={parity['overlap_mean']:.3f}"
+            if parity["overlap_min"] is not None
+            else ""
+        )
+        print(
+            f"{name:<22} p50={stats['p50_ms']:.2f} p95={stats['p95_ms']:.2f} ms, "
+            f"cos min={parity['cosine_min']:.4f} średnio={parity['cosine_mean']:.4f} "
+            f"{overlap} {'OK' if ok else 'NIEZGODNY'}"
+        )
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import argparse
+import csv
+import random
+
+# Kolumny w układzie eksportu CSV z ClinicalTrials.gov
+COLUMNS = [
+    "NCT Number",
+    "Study Title",
+    "Study Status",
+    "Brief Summary",
+    "Conditions",
+    "Interventions",
+    "Sex",
+    "Age",
+    "Phases",
+    "Enrollment",
+    "Study Type",
+    "Start Date",
+    "Locations",
+]
+
+CONDITIONS = [
+    "Breast Cancer",
+    "Lung Cancer",
+    "Non-small Cell Lung Cancer",
+    "Colorectal Cancer",
+    "Prostate Cancer",
+    "Pancreatic Cancer",
+    "Ovarian Cancer",
+    "Melanoma",
+    "Leukemia",
+    "Acute Myeloid Leukemia",
+    "Lymphoma",
+    "Multiple Myeloma",
+    "Glioblastoma",
+    "Hepatocellular Carcinoma",
+    "Type 2 Diabetes",
+    "Type 1 Diabetes",
+    "Diabetes Mellitus, Type 2",
+    "Gestational Diabetes",
+    "Diabetic Foot Ulcer",
+    "Diabetic Retinopathy",
+    "Obesity",
+    "Insulin Resistance",
+    "Heart Failure",
+    "Atrial Fibrillation",
+    "Hypertension",
+    "Coronary Artery Disease",
+    "Myocardial Infarction",
+    "Stroke",
+    "Cardiomyopathy",
+    "Aortic Stenosis",
+    "Hyperlipidemia",
+    "Peripheral Arterial Disease",
+]
+
+DRUGS = [
+    "Pembrolizumab",
+    "Nivolumab",
+    "Trastuzumab",
+    "Carboplatin",
+    "Paclitaxel",
+    "Metformin",
+    "Insulin Glargine",
+    "Semaglutide",
+    "Empagliflozin",
+    "Dapagliflozin",
+    "Atorvastatin",
+    "Apixaban",
+    "Rivaroxaban",
+    "Sacubitril/Valsartan",
+    "Placebo",
+]
+
+OTHER_INTERVENTIONS = [
+    "PROCEDURE: Surgery",
+    "RADIATION: Radiotherapy",
+    "BEHAVIORAL: Lifestyle Intervention",
+    "DEVICE: Continuous Glucose Monitor",
+    "DEVICE: Implantable Cardioverter Defibrillator",
+    "OTHER: Standard of Care",
+    "DIETARY_SUPPLEMENT: Vitamin D",
+]
+
+SITES = [
+    ("Medical University of Warsaw", "Warsaw", "Poland"),
+    ("Jagiellonian University Hospital", "Krakow", "Poland"),
+    ("Charite", "Berlin", "Germany"),
+    ("Hopital Europeen Georges Pompidou", "Paris", "France"),
+    ("Mayo Clinic", "Rochester, Minnesota", "United States"),
+    ("MD Anderson Cancer Center", "Houston, Texas", "United States"),
+    ("Massachusetts General Hospital", "Boston, Massachusetts", "United States"),
+    ("Toronto General Hospital", "Toronto, Ontario", "Canada"),
+    ("Karolinska University Hospital", "Stockholm", "Sweden"),
+    ("Peking Union Medical College Hospital", "Beijing", "China"),
+    ("Seoul National University Hospital", "Seoul", "Korea, Republic of"),
+    ("Royal Melbourne Hospital", "Melbourne, Victoria", "Australia"),
+]
+
+SUMMARY_PHRASES = [
+    "The purpose of this study is to evaluate the safety and efficacy of {drug} in patients with {condition}.",
+    "This randomized, double-blind trial compares {drug} with placebo.",
+    "Participants will receive treatment for {weeks} weeks and will be followed for one year.",
+    "The primary outcome is overall survival; secondary outcomes include quality of life.",
+    "Improved outcomes and a reduced risk of hospitalization are expected.",
+    "Previous studies showed poor tolerability and an increased risk of adverse events.",
+    "The study will assess glycemic control measured by HbA1c.",
+    "Researchers will measure changes in left ventricular ejection fraction.",
+    "Tumor response will be assessed according to RECIST criteria.",
+]
+
+PHASES = [
+    ("", 25),
+    ("EARLY_PHASE1", 2),
+    ("PHASE1", 12),
+    ("PHASE1|PHASE2", 5),
+    ("PHASE2", 20),
+    ("PHASE2|PHASE3", 3),
+    ("PHASE3", 15),
+    ("PHASE4", 10),
+    ("NA", 8),
+]
+
+AGES = [
+    ("ADULT, OLDER_ADULT", 70),
+    ("CHILD, ADULT, OLDER_ADULT", 15),
+    ("CHILD", 5),
+    ("ADULT", 10),
+]
+STATUSES = [
+    ("COMPLETED", 50),
+    ("UNKNOWN", 15),
+    ("RECRUITING", 12),
+    ("TERMINATED", 7),
+    ("ACTIVE_NOT_RECRUITING", 6),
+    ("WITHDRAWN", 3),
+    ("NOT_YET_RECRUITING", 4),
+    ("ENROLLING_BY_INVITATION", 2),
+    ("SUSPENDED", 1),
+]
+SEXES = [("ALL", 80), ("FEMALE", 14), ("MALE", 6)]
+TYPES = [("INTERVENTIONAL", 75), ("OBSERVATIONAL", 24), ("EXPANDED_ACCESS", 1)]
+
+
+def weighted(rng, choices):
+    """Losuje wartość z listy par (wartość, waga)"""
+    values, weights = zip(*choices)
+    return rng.choices(values, weights=weights)[0]
+
+
+def generate_row(rng, number):
+    """Losuje jeden wiersz badania"""
+    conditions = rng.sample(CONDITIONS, rng.choices([1, 2, 3], weights=[60, 30, 10])[0])
+    drugs = rng.sample(DRUGS, rng.randint(1, 3))
+    interventions = [f"DRUG: {d}" for d in drugs]
+
+    if rng.random() < 0.3:
+        interventions.append(rng.choice(OTHER_INTERVENTIONS))
+
+    sites = rng.sample(SITES, rng.randint(1, 5))
+    locations = "|".join(f"{name}, {city}, {country}" for name, city, country in sites)
+
+    summary = " ".join(
+        phrase.format(
+            drug=drugs[0], condition=conditions[0].lower(), weeks=rng.choice([12, 24, 52])
+        )
+        for phrase in rng.sample(SUMMARY_PHRASES, rng.randint(2, 5))
+    )
+
+    year = rng.randint(1995, 2027)
+    start_date = f"{year}-{rng.randint(1, 12):02d}"
+    if rng.random() < 0.7:
+        start_date += f"-{rng.randint(1, 28):02d}"
+
+    return [
+        f"NCT{number:08d}",
+        f"A Study of {drugs[0]} in {conditions[0]}",
+        weighted(rng, STATUSES),
+        summary if rng.random() > 0.02 else "",
+        "|".join(conditions),
+        "|".join(interventions),
+        weighted(rng, SEXES),
+        weighted(rng, AGES),
+        weighted(rng, PHASES),
+        rng.randint(10, 3000) if rng.random() > 0.03 else "",
+        weighted(rng, TYPES),
+        start_date,
+        locations,
+    ]
+
+
+def generate(path, n_rows, seed=0):
+    """Zapisuje syntetyczny plik CSV o podanej liczbie badań (powtarzalny dla ziarna)"""
+    rng = random.Random(seed)
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+
+        for i in range(n_rows):
+            writer.writerow(generate_row(rng, i))
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.generate_data --rows 1000000 --output data/synthetic.csv
+    parser = argparse.ArgumentParser(description="Syntetyczne dane badań klinicznych")
+    parser.add_argument("--rows", type=int, default=160000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="data/synthetic.csv")
+    args = parser.parse_args()
+
+    generate(args.output, args.rows, args.seed)
+    print(f"Zapisano {args.rows} badań do {args.output}")
@@ -0,0 +1,255 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.generate_data import generate  # noqa: E402
+
+# Zapytania wyszukiwarki oraz zapytania z literówkami do podpowiedzi
+QUERIES = [
+    "breast cancer chemotherapy",
+    "metastatic lung cancer immunotherapy",
+    "type 2 diabetes insulin",
+    "diabetic foot ulcer",
+    "heart failure with reduced ejection fraction",
+    "atrial fibrillation anticoagulation",
+    "hypertension lifestyle intervention",
+    "childhood leukemia",
+    "rak piersi",
+    "cukrzyca u dzieci",
+]
+
+TYPO_QUERIES = [
+    "brest cancer",
+    "diabetis",
+    "hart failure",
+    "atrial fibrilation",
+    "leukemi",
+]
+
+FILTER_SETS = [
+    {},
+    {"status": ["RECRUITING"]},
+    {"phase": ["PHASE3"], "type": ["INTERVENTIONAL"]},
+    {"age": ["CHILD"], "sex": ["FEMALE"]},
+    {"status": ["COMPLETED", "TERMINATED"], "phase": ["PHASE2", "PHASE3"]},
+]
+
+
+def summarize(timings):
+    """Percentyle opóźnień (ms) i przepustowość (operacje/s)"""
+    values = np.asarray(timings) * 1000
+
+    return {
+        "n": len(values),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "mean_ms": round(float(values.mean()), 3),
+        "throughput_per_s": round(len(values) / max(values.sum() / 1000, 1e-9), 1),
+    }
+
+
+def measure(operations, repeat, before=None):
+    """Mierzy czas kolejnych operacji (z rozgrzewką przed pomiarem)"""
+    operations[0]()
+    timings = []
+
+    for i in range(repeat):
+        operation = operations[i % len(operations)]
+
+        if before is not None:
+            before()
+
+        start = time.perf_counter()
+        operation()
+        timings.append(time.perf_counter() - start)
+
+    return summarize(timings)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def build_environment(workdir, rows, seed, rebuild_embeddings=False):
+    """Generuje dane, ładuje bazę i buduje osadzenia w katalogu roboczym"""
+    os.makedirs(os.path.join(workdir, "data"), exist_ok=True)
+    os.chdir(workdir)
+
+    # Bez zapisanych osadzeń mierzony jest pełny czas ich budowy
+    if rebuild_embeddings and os.path.exists("models"):
+        shutil.rmtree("models")
+    full_build = not os.path.exists("models")
+
+    csv_path = os.path.join("data", f"synthetic_{rows}_{seed}.csv")
+    if not os.path.exists(csv_path):
+        print(f"Generowanie {rows} badań...")
+        generate(csv_path, rows, seed)
+
+    import init_db
+
+    start = time.perf_counter()
+    init_db.main([csv_path])
+    ingest_s = time.perf_counter() - start
+
+    # Osadzenia budowane są przy tworzeniu silnika (tak jak po starcie aplikacji)
+    from services.search import search_warmup
+
+    start = time.perf_counter()
+    engine = search_warmup.wait()
+    embeddings_s = time.perf_counter() - start
+
+    return engine, {
+        "ingest_s": round(ingest_s, 2),
+        "embeddings_s": round(embeddings_s, 2),
+        "embeddings_full_build": full_build,
+    }
+
+
+def run(workdir, rows, seed, repeat, rebuild_embeddings=False):
+    engine, build_times = build_environment(workdir, rows, seed, rebuild_embeddings)
+    random.seed(seed)
+
+    from app import app, results_cache
+    from services.database import fetch_trials_paginated, pool
+    from services.stats import fetch_stats
+
+    conn = pool.connection()
+    client = app.test_client()
+    results = {}
+
+    # Zapytania bez pamięci zapytań (kodowanie i przeszukanie przy każdym
+    # wywołaniu) oraz powtarzane zapytania obsługiwane z pamięci
+    search_operations = [lambda q=q: engine.get_relevant_ids(q) for q in QUERIES]
+    results["get_relevant_ids"] = measure(
+        search_operations, repeat, before=engine.memo.clear
+    )
+    results["get_relevant_ids_warm"] = measure(search_operations, repeat)
+    results["get_suggestion"] = measure(
+        [lambda q=q: engine.get_suggestion(q) for q in TYPO_QUERIES], repeat
+    )
+    results["fetch_trials_paginated"] = measure(
+        [
+            lambda f=f: fetch_trials_paginated(conn, f, [], random.randint(1, 50), 20)
+            for f in FILTER_SETS
+        ],
+        repeat,
+    )
+    results["stats_unfiltered"] = measure([lambda: fetch_stats(conn)], repeat)
+    results["stats_filtered"] = measure(
+        [lambda f=f: fetch_stats(conn, f) for f in FILTER_SETS[1:]], repeat
+    )
+
+    def clear_caches():
+        results_cache.clear()
+        engine.memo.clear()
+
+    # Pełne renderowanie strony wyników bez pamięci podręcznej i pamięci zapytań
+    # oraz przy zapamiętanych wektorach i rankingach zapytań
+    render_operations = [
+        lambda q=q: client.get("/", query_string={"q": q}) for q in QUERIES
+    ]
+    results["render_index"] = measure(render_operations, repeat, before=clear_caches)
+    results["render_index_warm"] = measure(
+        render_operations, repeat, before=results_cache.clear
+    )
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "rows": rows,
+        "seed": seed,
+        "repeat": repeat,
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "build": build_times,
+        "results": results,
+    }
+
+
+def compare(report, baseline):
+    """Wypisuje zmianę p50 i p95 względem wcześniejszego raportu"""
+    print(f"Porównanie z {baseline.get('commit')} ({baseline.get('timestamp')}):")
+
+    for name, current in report["results"].items():
+        previous = baseline.get("results", {}).get(name)
+
+        if not previous:
+            continue
+
+        ratios = [
+            f"{key}: {previous[key]:.2f} -> {current[key]:.2f} ms "
+            f"({current[key] / max(previous[key], 1e-9):.2f}x)"
+            for key in ("p50_ms", "p95_ms")
+        ]
+        print(f"  {name:<24} " + ", ".join(ratios))
+
+
+def main():
+    # python -m benchmarks.run --rows 160000 --compare benchmarks/results/abc123.json
+    parser = argparse.ArgumentParser(description="Pomiary wydajności ClinicalScope")
+    parser.add_argument("--rows", type=int, default=160000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--workdir", default=os.path.join(ROOT, "benchmarks", "work"))
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None)
+    parser.add_argument("--rebuild-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    workdir = os.path.abspath(args.workdir)
+    output = args.output and os.path.abspath(args.output)
+    baseline = args.compare and os.path.abspath(args.compare)
+
+    report = run(
+        workdir, args.rows, args.seed, args.repeat, args.rebuild_embeddings
+    )
+
+    for name, stats in report["results"].items():
+        print(
+            f"{name:<24} p50={stats['p50_ms']:.2f} p95={stats['p95_ms']:.2f} "
+            f"p99={stats['p99_ms']:.2f} ms, {stats['throughput_per_s']:.1f} op/s"
+        )
+    print(
+        f"Ładowanie bazy: {report['build']['ingest_s']} s, "
+        f"osadzenia: {report['build']['embeddings_s']} s"
+    )
+
+    if output is None:
+        results_dir = os.path.join(ROOT, "benchmarks", "results")
+        os.makedirs(results_dir, exist_ok=True)
+        name = f"{report['commit'] or 'local'}-{args.rows}-{int(time.time())}.json"
+        output = os.path.join(results_dir, name)
+
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"Zapisano wyniki: {output}")
+
+    if baseline:
+        with open(baseline, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+from services.embeddings import ENCODE_WORKERS, SHARD_SIZE
+from services.search import SearchEngine
+
+# Osadzenia są aktualizowane przy tworzeniu silnika wyszukiwania
+# (EMBED_WORKERS=32 EMBED_SHARD_SIZE=4096 python build_embeddings.py)
+if __name__ == "__main__":
+    print(f"Procesy: {ENCODE_WORKERS}, wielkość shardu: {SHARD_SIZE}")
+
+    search_engine = SearchEngine(encode_workers=ENCODE_WORKERS)
+
+    if search_engine.store is None:
+        print("Nie udało się zbudować osadzeń")
+    else:
+        print(f"Osadzenia gotowe: {len(search_engine.store)} wierszy")
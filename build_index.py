@@ -0,0 +1,64 @@
+import sys
+import time
+
+from services.ann import recall_at_k
+from services.embeddings import ENCODE_WORKERS
+from services.search import SearchEngine
+
+# Zapytania kontrolne do pomiaru trafności
+SAMPLE_QUERIES = [
+    "breast cancer chemotherapy",
+    "metastatic lung cancer immunotherapy",
+    "type 2 diabetes insulin",
+    "diabetic foot ulcer",
+    "heart failure with reduced ejection fraction",
+    "atrial fibrillation anticoagulation",
+    "hypertension lifestyle intervention",
+    "childhood leukemia",
+    "rak piersi",
+    "cukrzyca u dzieci",
+]
+
+
+def evaluate(search_engine, n_probes, top_n=100):
+    """Porównuje wyniki indeksu IVF z pełnym przeszukaniem (recall@top_n)"""
+    # Bez pamięci zapytań oba pomiary obejmują kodowanie zapytania i przeszukanie
+    memo_bytes = search_engine.memo.max_bytes
+    search_engine.memo.max_bytes = 0
+    exact_results = {}
+    start = time.perf_counter()
+
+    for q in SAMPLE_QUERIES:
+        exact_results[q] = search_engine.get_relevant_ids(
+            q, top_n=top_n, exact=True, mode="semantic"
+        )
+
+    exact_ms = (time.perf_counter() - start) * 1000 / len(SAMPLE_QUERIES)
+    print(f"Pełne przeszukanie: {exact_ms:.1f} ms/zapytanie")
+
+    for n_probe in n_probes:
+        recalls = []
+        start = time.perf_counter()
+
+        for q in SAMPLE_QUERIES:
+            approx = search_engine.get_relevant_ids(
+                q, top_n=top_n, n_probe=n_probe, mode="semantic"
+            )
+            recalls.append(recall_at_k(exact_results[q], approx, k=top_n))
+
+        ivf_ms = (time.perf_counter() - start) * 1000 / len(SAMPLE_QUERIES)
+        recall = sum(recalls) / len(recalls)
+        print(
+            f"n_probe={n_probe:<4} recall@{top_n}={recall:.3f} czas={ivf_ms:.1f} ms/zapytanie"
+        )
+
+    search_engine.memo.max_bytes = memo_bytes
+
+
+if __name__ == "__main__":
+    # Opcjonalna liczba list: python build_index.py 1600
+    n_lists = int(sys.argv[1]) if len(sys.argv) > 1 else None
+
+    search_engine = SearchEngine(encode_workers=ENCODE_WORKERS)
+    search_engine.build_index(n_lists=n_lists)
+    evaluate(search_engine, [1, 4, 8, 16, 32, 64])
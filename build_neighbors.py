@@ -0,0 +1,24 @@
+import os
+
+from services.embeddings import ENCODE_WORKERS
+from services.neighbors import NEIGHBORS_K, NEIGHBORS_WORKERS, NeighborGraph, build_graph
+from services.search import SearchEngine
+
+# Graf podobnych badań (k najbliższych sąsiadów każdego badania); przy ponownym
+# uruchomieniu liczone są tylko wiersze zmienione od poprzedniej wersji
+# (NEIGHBORS_K=20 NEIGHBORS_WORKERS=8 python build_neighbors.py)
+if __name__ == "__main__":
+    print(f"Sąsiedzi: {NEIGHBORS_K}, wątki: {NEIGHBORS_WORKERS}")
+
+    search_engine = SearchEngine(encode_workers=ENCODE_WORKERS)
+
+    if search_engine.store is None:
+        print("Brak osadzeń, graf nie został zbudowany")
+    else:
+        previous = None
+        if os.path.exists(NeighborGraph.paths(search_engine.models_dir)["keys"]):
+            previous = NeighborGraph.load(search_engine.models_dir)
+
+        graph, n_computed = build_graph(search_engine.store, previous)
+        graph.save(search_engine.models_dir)
+        print(f"Graf gotowy: {len(graph.ids)} badań, przeliczone: {n_computed}")
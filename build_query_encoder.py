@@ -0,0 +1,13 @@
+from services.embeddings import MODEL_NAME
+from services.encoder import ONNX_DIR, export_onnx
+
+# Eksport kodera zapytań do ONNX (model float32 i skwantyzowany int8);
+# użycie: QUERY_ENCODER=onnx python app.py, zgodność: python -m benchmarks.encoder_parity
+if __name__ == "__main__":
+    from sentence_transformers import SentenceTransformer
+
+    print(f"Eksport modelu {MODEL_NAME} do {ONNX_DIR}...")
+    model = SentenceTransformer(MODEL_NAME)
+
+    for path in export_onnx(model):
+        print(f"Zapisano {path}")
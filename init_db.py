@@ -1,28 +1,228 @@
 import os
+import sys
 import sqlite3
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 
+from services.database import FACET_TABLES, META_TABLE
+from services.lexical import build_fts_index
+from services.stats import build_stats_tables
+from utils.formatters import (
+    clean_text,
+    clean_locations,
+    get_sentiment_key,
+    split_values,
+)
+
 DATABASE = os.path.join("instance", "clinical_trials.db")
+CSV_FILES = ["data/cancer.csv", "data/diabetes.csv", "data/heart.csv"]
+
+# Liczba wierszy CSV wczytywanych naraz (jedna transakcja na fragment)
+INGEST_CHUNK_SIZE = int(os.environ.get("INGEST_CHUNK_SIZE", 20000))
+ENRICH_CHUNK_SIZE = 5000
+
+ENRICHED_COLUMNS = ["Sentiment", "Countries", "Conditions Clean", "Interventions Clean"]
+STAGING_SUFFIX = "_staging"
+
+
+def enrich_chunk(rows):
+    """Wylicza pola prezentacyjne dla fragmentu danych"""
+    summaries, locations, conditions, interventions = rows
+
+    return {
+        # Opis zastępczy ocenia się tak samo jak w widoku wyników
+        "Sentiment": [
+            get_sentiment_key(text or "Brak szczegółowego opisu") for text in summaries
+        ],
+        "Countries": [clean_locations(text) for text in locations],
+        "Conditions Clean": [clean_text(text) for text in conditions],
+        "Interventions Clean": [clean_text(text) for text in interventions],
+    }
+
+
+def enrich(df, executor):
+    """Dodaje kolumny wzbogacone, licząc je równolegle na puli procesów"""
+    columns = ["Brief Summary", "Locations", "Conditions", "Interventions"]
+    values = {
+        col: [v if isinstance(v, str) else "" for v in df[col].tolist()]
+        for col in columns
+    }
+
+    chunks = [
+        tuple(values[col][start : start + ENRICH_CHUNK_SIZE] for col in columns)
+        for start in range(0, len(df), ENRICH_CHUNK_SIZE)
+    ]
+
+    results = {}
+    for part in executor.map(enrich_chunk, chunks):
+        for col, col_values in part.items():
+            results.setdefault(col, []).extend(col_values)
+
+    for col, col_values in results.items():
+        df[col] = col_values
+
+    return df
+
+
+def iter_csv_chunks(paths, chunk_size=INGEST_CHUNK_SIZE):
+    """Wczytuje kolejne pliki CSV fragmentami o stałej liczbie wierszy"""
+    for path in paths:
+        print(f"Wczytywanie {path}...")
+
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype=str)
+
+
+def create_staging_tables(conn, columns):
+    """Tworzy puste tabele pośrednie (UNIQUE na numerze NCT usuwa duplikaty)"""
+    column_defs = []
+
+    for col_name in columns:
+        col_type = "INTEGER" if col_name == "Enrollment" else "TEXT"
+        unique = " UNIQUE" if col_name == "NCT Number" else ""
+        column_defs.append(f'"{col_name}" {col_type}{unique}')
+
+    conn.execute(f"DROP TABLE IF EXISTS trials{STAGING_SUFFIX}")
+    conn.execute(f"CREATE TABLE trials{STAGING_SUFFIX} ({', '.join(column_defs)})")
+
+    for table, col_name, _, _ in FACET_TABLES.values():
+        conn.execute(f"DROP TABLE IF EXISTS {table}{STAGING_SUFFIX}")
+        conn.execute(
+            f'CREATE TABLE {table}{STAGING_SUFFIX} ("NCT Number" TEXT, "{col_name}" TEXT)'
+        )
+
+    conn.commit()
+
+
+def insert_chunk(conn, df, columns):
+    """Zapisuje fragment do tabel pośrednich w jednej transakcji
+
+    Zwraca liczbę dodanych badań.
+    """
+    df = df.reindex(columns=columns)
+    df["Enrollment"] = pd.to_numeric(df["Enrollment"], errors="coerce").astype("Int64")
+
+    # Brakujące wartości zapisywane są jako NULL
+    records = df.astype(object).where(df.notna(), None)
+    placeholders = ",".join("?" * len(columns))
+    ids = df["NCT Number"].tolist()
+
+    with conn:
+        before = conn.total_changes
+        conn.executemany(
+            f"INSERT OR IGNORE INTO trials{STAGING_SUFFIX} VALUES ({placeholders})",
+            records.itertuples(index=False, name=None),
+        )
+        inserted = conn.total_changes - before
+
+        # Rozdzielenie kolumn wielowartościowych do tabel łączących
+        for table, _, source, separators in FACET_TABLES.values():
+            rows = (
+                (nct_id, value)
+                for nct_id, text in zip(ids, df[source].tolist())
+                for value in split_values(text, separators)
+            )
+            conn.executemany(f"INSERT INTO {table}{STAGING_SUFFIX} VALUES (?, ?)", rows)
+
+    return inserted
+
+
+def create_indexes(conn):
+    """Tworzy indeksy na kolumnach używanych w filtrach oraz w tabelach łączących"""
+    # Indeks unikalny numeru NCT tworzy ograniczenie UNIQUE tabeli
+    for col_name in ["Study Status", "Study Type", "Sex"]:
+        index_name = "idx_trials_" + col_name.lower().replace(" ", "_")
+        conn.execute(f'CREATE INDEX {index_name} ON trials ("{col_name}")')
+
+    # Indeks pokrywający filtrowanie oraz indeks do złączeń po NCT
+    for table, col_name, _, _ in FACET_TABLES.values():
+        conn.execute(
+            f'CREATE INDEX idx_{table}_value ON {table} ("{col_name}", "NCT Number")'
+        )
+        conn.execute(f'CREATE INDEX idx_{table}_nct ON {table} ("NCT Number")')
+
+    conn.execute("ANALYZE")
+
+
+def write_data_version(conn):
+    """Zapisuje nową wersję danych (unieważnia wpisy pamięci podręcznej aplikacji)"""
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {META_TABLE} (key TEXT PRIMARY KEY, value TEXT)"
+    )
+    conn.execute(
+        f"INSERT OR REPLACE INTO {META_TABLE} (key, value) VALUES ('data_version', ?)",
+        [uuid.uuid4().hex],
+    )
+
+
+def swap_staging_tables(conn):
+    """Podmienia tabele na pośrednie i buduje indeksy w jednej transakcji
+
+    Aplikacja (tryb WAL) do chwili zatwierdzenia widzi poprzednią wersję danych.
+    """
+    tables = ["trials"] + [table for table, _, _, _ in FACET_TABLES.values()]
+
+    conn.isolation_level = None
+    conn.execute("BEGIN IMMEDIATE")
+
+    try:
+        for table in tables:
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.execute(f"ALTER TABLE {table}{STAGING_SUFFIX} RENAME TO {table}")
+
+        create_indexes(conn)
+        build_fts_index(conn)
+        build_stats_tables(conn)
+        write_data_version(conn)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def main(paths=CSV_FILES):
+    # Stworzenie katalogu instancji
+    if not os.path.exists("instance"):
+        os.makedirs("instance")
+
+    conn = sqlite3.connect(DATABASE)
+
+    # Tryb WAL pozwala aplikacji czytać bazę podczas jej przeładowywania
+    conn.execute("PRAGMA journal_mode=WAL")
+
+    # Schemat: kolumny pierwszego pliku oraz kolumny wzbogacone
+    source_columns = list(pd.read_csv(paths[0], nrows=0).columns)
+    columns = source_columns + ENRICHED_COLUMNS
+    create_staging_tables(conn, columns)
+
+    # Numery NCT zapisanych badań (duplikaty pomijane jeszcze przed wzbogaceniem)
+    seen = set()
+    total = 0
+
+    with ProcessPoolExecutor() as executor:
+        for chunk in iter_csv_chunks(paths):
+            chunk = chunk.drop_duplicates(subset=["NCT Number"])
+            chunk = chunk[~chunk["NCT Number"].isin(seen)]
+
+            if chunk.empty:
+                continue
 
-# Stworzenie katalogu instancji
-if not os.path.exists("instance"):
-    os.makedirs("instance")
+            seen.update(chunk["NCT Number"])
 
-# Wczytanie danych
-df1 = pd.read_csv("data/cancer.csv")
-df2 = pd.read_csv("data/diabetes.csv")
-df3 = pd.read_csv("data/heart.csv")
+            # Wzbogacenie danych (wydźwięk, kraje, oczyszczone listy)
+            chunk = enrich(chunk.copy(), executor)
+            total += insert_chunk(conn, chunk, columns)
+            print(f"Zapisano {total} badań")
 
-# Połączenie danych
-full_df = pd.concat([df1, df2, df3])
+    # Podmiana tabel wraz z indeksami i zmaterializowanymi statystykami
+    print("Podmiana tabel, budowanie indeksów i statystyk...")
+    swap_staging_tables(conn)
+    conn.close()
 
-# Usunięcie diplikatów
-full_df = full_df.drop_duplicates(subset=["NCT Number"])
+    print("Baza danych gotowa!")
 
-# Zapisanie do bazy danych
-print("Zapisywanie danych do bazy...")
-conn = sqlite3.connect(DATABASE)
-full_df.to_sql("trials", conn, if_exists="replace", index=False)
-conn.close()
 
-print("Baza danych gotowa!")
+if __name__ == "__main__":
+    # Opcjonalna lista plików: python init_db.py data/ctg-studies.csv
+    main(sys.argv[1:] or CSV_FILES)
@@ -0,0 +1,144 @@
+import os
+
+import numpy as np
+
+
+class IVFIndex:
+    """Przybliżony indeks wektorowy IVF (odwrócone listy z kwantyzatorem zgrubnym)"""
+
+    def __init__(self, centroids, list_offsets, list_rows, n_rows):
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.n_rows = n_rows
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, matrix, n_lists=None, n_iter=10, sample_size=50000, seed=0):
+        """Trenuje kwantyzator zgrubny (k-średnich) i przypisuje wiersze do list"""
+        matrix = _normalize(np.asarray(matrix, dtype=np.float32))
+        n_rows = len(matrix)
+
+        if n_lists is None:
+            n_lists = max(1, int(4 * np.sqrt(n_rows)))
+
+        n_lists = min(n_lists, n_rows)
+        rng = np.random.default_rng(seed)
+
+        # Próbka treningowa
+        if n_rows > sample_size:
+            sample = matrix[rng.choice(n_rows, sample_size, replace=False)]
+        else:
+            sample = matrix
+
+        # Sferyczne k-średnich
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+        for _ in range(n_iter):
+            assignment = _nearest_centroids(sample, centroids)
+
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=n_lists)
+
+            # Puste listy dostają losowy punkt z próbki
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+
+            centroids = _normalize(sums)
+
+        # Przypisanie wszystkich wierszy do list
+        assignment = _nearest_centroids(matrix, centroids)
+        list_rows = np.argsort(assignment, kind="stable").astype(np.int32)
+        counts = np.bincount(assignment, minlength=n_lists)
+        list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        return cls(centroids, list_offsets, list_rows, n_rows)
+
+    def search(self, store, query_vec, top_n=100, n_probe=16, mask=None):
+        """Zwraca indeksy i wyniki najlepszych wierszy z `n_probe` najbliższych list
+
+        Opcjonalna maska logiczna ogranicza kandydatów do wierszy spełniających filtry.
+        """
+        query_vec = _normalize(np.asarray(query_vec, dtype=np.float32).reshape(1, -1))[0]
+
+        # Wybór najbliższych list
+        n_probe = min(n_probe, self.n_lists)
+        centroid_scores = self.centroids @ query_vec
+        probe = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+
+        candidates = np.concatenate(
+            [
+                self.list_rows[self.list_offsets[i] : self.list_offsets[i + 1]]
+                for i in probe
+            ]
+        )
+
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+
+        if len(candidates) == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+
+        # Dokładne podobieństwo wewnątrz kandydatów
+        candidates.sort()
+        vectors = store.vectors(candidates)
+        scores = vectors @ query_vec / np.maximum(np.linalg.norm(vectors, axis=1), 1e-12)
+
+        k = min(top_n, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        return candidates[top].astype(np.int64), scores[top]
+
+    def save(self, path):
+        """Zapisuje indeks na dysk (plik tymczasowy i podmiana)"""
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path,
+            centroids=self.centroids,
+            list_offsets=self.list_offsets,
+            list_rows=self.list_rows,
+            n_rows=np.array(self.n_rows),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Wczytuje indeks z dysku"""
+        with np.load(path) as data:
+            return cls(
+                data["centroids"],
+                data["list_offsets"],
+                data["list_rows"],
+                int(data["n_rows"]),
+            )
+
+
+def recall_at_k(exact_ids, approx_ids, k=100):
+    """Odsetek dokładnych wyników top-k odnalezionych przez wyszukiwanie przybliżone"""
+    exact = list(exact_ids)[:k]
+
+    if not exact:
+        return 1.0
+
+    return len(set(exact) & set(list(approx_ids)[:k])) / len(exact)
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def _nearest_centroids(matrix, centroids, chunk_size=16384):
+    assignment = np.empty(len(matrix), dtype=np.int64)
+
+    for start in range(0, len(matrix), chunk_size):
+        block = matrix[start : start + chunk_size]
+        assignment[start : start + chunk_size] = np.argmax(block @ centroids.T, axis=1)
+
+    return assignment
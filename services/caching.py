@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from services.database import fetch_data_version, pool
+from services.metrics import cache_requests
+
+# Liczba wpisów pamięci podręcznej procesu (LRU przed współdzielonym magazynem)
+LOCAL_CACHE_SIZE = int(os.environ.get("LOCAL_CACHE_SIZE", 256))
+
+# Co ile sekund sprawdzana jest wersja danych w bazie
+DATA_VERSION_TTL = 1.0
+
+# Maksymalny czas życia wpisów współdzielonego magazynu (w sekundach)
+SHARED_CACHE_TIMEOUT = int(os.environ.get("SHARED_CACHE_TIMEOUT", 600))
+
+# Katalogi kodu i szablonów, od których zależą zapisane wyniki i widoki
+SOURCE_DIRS = ("services", "utils", "templates")
+
+_MISSING = object()
+
+
+def _normalize(value):
+    return " ".join(str(value).split())
+
+
+def canonical_key(namespace, params, version):
+    """Klucz niezależny od kolejności parametrów i wartości oraz od nadmiarowych spacji"""
+    canonical = {
+        key: (
+            sorted(_normalize(v) for v in value)
+            if isinstance(value, (list, tuple))
+            else _normalize(value)
+        )
+        for key, value in params.items()
+        if value not in ("", [], None)
+    }
+    digest = hashlib.sha1(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+
+    return f"{namespace}:{version}:{digest}"
+
+
+def source_version(root, directories=SOURCE_DIRS):
+    """Skrót kodu aplikacji i szablonów (zmienia się przy każdym wdrożeniu)"""
+    paths = [name for name in os.listdir(root) if name.endswith(".py")]
+
+    for directory in directories:
+        for name in os.listdir(os.path.join(root, directory)):
+            if name.endswith((".py", ".html")):
+                paths.append(os.path.join(directory, name))
+
+    digest = hashlib.sha1()
+
+    for path in sorted(paths):
+        digest.update(path.encode())
+
+        with open(os.path.join(root, path), "rb") as f:
+            digest.update(f.read())
+
+    return digest.hexdigest()[:12]
+
+
+class _Call:
+    """Trwające wyliczenie wartości, na które czekają pozostałe wątki"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TieredCache:
+    """LRU procesu przed współdzielonym magazynem (Flask-Caching)
+
+    Klucze zawierają wersję danych oraz wersję aplikacji (funkcja `version`:
+    kod, ustawienia i osadzenia silnika), więc nowe ładowanie bazy lub wdrożenie
+    unieważnia wszystkie wpisy. Wpisy współdzielone wygasają po `timeout`
+    sekundach. Równoczesne chybienia tego samego klucza w procesie są
+    wyliczane tylko raz.
+    """
+
+    def __init__(
+        self,
+        shared=None,
+        max_entries=LOCAL_CACHE_SIZE,
+        timeout=SHARED_CACHE_TIMEOUT,
+        version=None,
+    ):
+        self.shared = shared
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.version = version
+        self.local = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked = 0.0
+
+    def data_version(self):
+        """Wersja danych z bazy (odczytywana co najwyżej raz na DATA_VERSION_TTL)"""
+        now = time.monotonic()
+
+        if self._version is None or now - self._version_checked > DATA_VERSION_TTL:
+            self._version = fetch_data_version(pool.connection())
+            self._version_checked = now
+
+        return self._version
+
+    def key_version(self):
+        """Wersja danych połączona z wersją aplikacji"""
+        if self.version is None:
+            return self.data_version()
+
+        return f"{self.data_version()}-{self.version()}"
+
+    def _get_local(self, key):
+        with self._lock:
+            value = self.local.get(key, _MISSING)
+
+            if value is not _MISSING:
+                self.local.move_to_end(key)
+
+            return value
+
+    def _set_local(self, key, value):
+        with self._lock:
+            self.local[key] = value
+            self.local.move_to_end(key)
+
+            while len(self.local) > self.max_entries:
+                self.local.popitem(last=False)
+
+    def get_or_compute(self, namespace, params, compute, store=None):
+        """Zwraca wartość z pamięci podręcznej lub wylicza ją (jednokrotnie dla klucza)
+
+        Opcjonalna funkcja store decyduje, czy wyliczoną wartość zapisać.
+        """
+        key = canonical_key(namespace, params, self.key_version())
+
+        value = self._get_local(key)
+        if value is not _MISSING:
+            cache_requests.inc(namespace, "local_hit")
+            return value
+
+        if self.shared is not None:
+            value = self.shared.get(key)
+
+            if value is not None:
+                cache_requests.inc(namespace, "shared_hit")
+                self._set_local(key, value)
+                return value
+
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+
+            if leader:
+                call = self._inflight[key] = _Call()
+
+        # Inny wątek już wylicza tę wartość
+        if not leader:
+            cache_requests.inc(namespace, "coalesced")
+            call.event.wait()
+
+            if call.error is not None:
+                raise call.error
+
+            return call.value
+
+        cache_requests.inc(namespace, "miss")
+
+        try:
+            value = compute()
+            call.value = value
+
+            if store is None or store(value):
+                self._set_local(key, value)
+
+                if self.shared is not None:
+                    self.shared.set(key, value, timeout=self.timeout)
+
+            return value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+            call.event.set()
+
+    def clear(self):
+        with self._lock:
+            self.local.clear()
+
+        if self.shared is not None:
+            self.shared.clear()
@@ -1,32 +1,125 @@
 import os
 import sqlite3
 import math
+import threading
+import urllib.parse
 import pandas as pd
 from flask import g
 
+from services.metrics import timed
+
 DATABASE = os.path.join("instance", "clinical_trials.db")
 
+# Kolumny jednowartościowe używane w filtrach: klucz filtra -> kolumna
+FACET_COLUMNS = {
+    "status": "Study Status",
+    "type": "Study Type",
+    "sex": "Sex",
+}
+
+# Tabele łączące dla kolumn wielowartościowych:
+# klucz filtra -> (tabela, kolumna wartości, kolumna źródłowa, separatory)
+FACET_TABLES = {
+    "phase": ("trial_phases", "Phase", "Phases", ("|", "/", ",")),
+    "age": ("trial_ages", "Age", "Age", ("|", "/", ",")),
+    "condition": ("trial_conditions", "Condition", "Conditions", ("|",)),
+    "intervention": ("trial_interventions", "Intervention", "Interventions", ("|",)),
+}
+
+# Tabela metadanych: wersja danych zapisywana przy każdym ładowaniu bazy
+META_TABLE = "meta"
+
+# Ustawienia połączeń tylko do odczytu
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE_KB = int(os.environ.get("SQLITE_CACHE_SIZE_KB", 64 * 1024))
+STATEMENT_CACHE_SIZE = 512
+
+
+class ConnectionPool:
+    """Pula połączeń tylko do odczytu, po jednym na wątek
+
+    Połączenie jest otwierane ponownie, gdy plik bazy został podmieniony.
+    """
+
+    def __init__(self, path=DATABASE):
+        self.path = path
+        self._local = threading.local()
+
+    def _open(self):
+        uri = "file:" + urllib.parse.quote(os.path.abspath(self.path)) + "?mode=ro"
+        conn = sqlite3.connect(
+            uri,
+            uri=True,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.row_factory = sqlite3.Row
+
+        # Tryb WAL ustawiany jest przy ładowaniu bazy (init_db.py)
+        conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+
+        return conn
+
+    def connection(self):
+        """Zwraca połączenie bieżącego wątku"""
+        inode = os.stat(self.path).st_ino
+        conn = getattr(self._local, "conn", None)
+
+        if conn is None or self._local.inode != inode:
+            if conn is not None:
+                conn.close()
+
+            conn = self._local.conn = self._open()
+            self._local.inode = inode
+
+        return conn
+
+    def close(self):
+        """Zamyka połączenie bieżącego wątku"""
+        conn = getattr(self._local, "conn", None)
+
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+pool = ConnectionPool()
+
 
 def get_db():
-    """Otwiera połączenie z bazą danych"""
+    """Zwraca połączenie z bazą danych z puli"""
     db = getattr(g, "_database", None)
 
     if db is None:
-        if not os.path.exists("instance"):
-            os.makedirs("instance")
-
-        db = g._database = sqlite3.connect(DATABASE)
-        db.row_factory = sqlite3.Row
+        db = g._database = pool.connection()
 
     return db
 
 
 def close_connection(exception):
-    """Zamyka połączenie z bazą danych"""
+    """Kończy ewentualną transakcję połączenia z puli (połączenie pozostaje otwarte)"""
     db = getattr(g, "_database", None)
 
-    if db is not None:
-        db.close()
+    if db is not None and db.in_transaction:
+        db.rollback()
+
+
+def in_clause(values):
+    """Buduje listę parametrów IN o długości zaokrąglonej do potęgi dwójki
+
+    Dzięki temu zapytania różniące się liczbą wartości dzielą przygotowane
+    instrukcje z pamięci podręcznej połączenia.
+    """
+    values = list(values)
+
+    if not values:
+        return "", []
+
+    size = 1 << (len(values) - 1).bit_length()
+    padded = values + values[-1:] * (size - len(values))
+
+    return ",".join("?" * size), padded
 
 
 def get_chart_data(query_sql, connection, mapping=None):
@@ -56,34 +149,32 @@ def build_search_query(filters, matching_ids=None):
     # 1. Filtrowanie po ID
     if filters.get("q"):
         if matching_ids:
-            placeholders = ",".join("?" * len(matching_ids))
+            placeholders, values = in_clause(matching_ids)
             conditions.append(f'"NCT Number" IN ({placeholders})')
-            params.extend(matching_ids)
+            params.extend(values)
         else:
             conditions.append("1=0")
 
     # 2. Filtry typu checkbox
-    for key, col_name in [
-        ("status", "Study Status"),
-        ("type", "Study Type"),
-        ("sex", "Sex"),
-    ]:
+    for key, col_name in FACET_COLUMNS.items():
         values = filters.get(key)
         if values:
-            placeholders = ",".join("?" * len(values))
+            placeholders, values = in_clause(values)
             conditions.append(f'"{col_name}" IN ({placeholders})')
             params.extend(values)
 
-    # 3. Filtry tekstowe
-    for key, col_name in [("phase", "Phases"), ("age", "Age")]:
+    # 3. Filtry wielowartościowe (tabele łączące z indeksami)
+    for key in ["phase", "age"]:
         values = filters.get(key)
 
         if values:
-            or_conditions = [f"{col_name} LIKE ?" for _ in values]
-            conditions.append(f"({' OR '.join(or_conditions)})")
-
-            for v in values:
-                params.append(f"%{v}%")
+            table, col_name = FACET_TABLES[key][:2]
+            placeholders, values = in_clause(values)
+            conditions.append(
+                f'"NCT Number" IN (SELECT "NCT Number" FROM {table} '
+                f'WHERE "{col_name}" IN ({placeholders}))'
+            )
+            params.extend(values)
 
     return " AND ".join(conditions), params
 
@@ -94,7 +185,8 @@ def fetch_trials_paginated(conn, filters, matching_ids, page, per_page):
 
     # Zapytanie o licznik
     count_sql = f"SELECT COUNT(*) FROM trials WHERE {where_clause}"
-    total_results = conn.execute(count_sql, params).fetchone()[0]
+    with timed("count_query"):
+        total_results = conn.execute(count_sql, params).fetchone()[0]
     total_pages = math.ceil(total_results / per_page)
 
     # Zapytanie o dane
@@ -102,13 +194,35 @@ def fetch_trials_paginated(conn, filters, matching_ids, page, per_page):
     data_sql = f"SELECT * FROM trials WHERE {where_clause} LIMIT ? OFFSET ?"
     data_params = params + [per_page, offset]
 
-    cursor = conn.cursor()
-    cursor.execute(data_sql, data_params)
-    rows = cursor.fetchall()
+    with timed("data_query"):
+        cursor = conn.cursor()
+        cursor.execute(data_sql, data_params)
+        rows = cursor.fetchall()
 
     return [dict(row) for row in rows], total_pages, total_results
 
 
+def fetch_filtered_ids(conn, filters, matching_ids):
+    """Zwraca zbiór numerów NCT spełniających filtry"""
+    where_clause, params = build_search_query(filters, matching_ids)
+    sql = f'SELECT "NCT Number" FROM trials WHERE {where_clause}'
+
+    return {row[0] for row in conn.execute(sql, params)}
+
+
+def fetch_trials_by_ids(conn, ids):
+    """Pobiera wiersze po kluczu NCT w podanej kolejności"""
+    if not ids:
+        return []
+
+    placeholders, params = in_clause(ids)
+    sql = f'SELECT * FROM trials WHERE "NCT Number" IN ({placeholders})'
+    with timed("data_query"):
+        rows = {row["NCT Number"]: dict(row) for row in conn.execute(sql, params)}
+
+    return [rows[i] for i in ids if i in rows]
+
+
 def fetch_unique_options(conn, column):
     """Pobiera unikalne wartości do filtrów"""
     try:
@@ -117,3 +231,26 @@ def fetch_unique_options(conn, column):
         return [row[0] for row in conn.execute(query)]
     except Exception:
         return []
+
+
+def fetch_facet_values(conn, key):
+    """Pobiera unikalne wartości kolumny wielowartościowej z tabeli łączącej"""
+    table, col_name = FACET_TABLES[key][:2]
+
+    try:
+        query = f'SELECT DISTINCT "{col_name}" FROM {table} ORDER BY "{col_name}"'
+
+        return [row[0] for row in conn.execute(query)]
+    except Exception:
+        return []
+
+
+def fetch_data_version(conn):
+    """Zwraca wersję danych zapisaną podczas ładowania bazy ("0" dla starszych baz)"""
+    try:
+        row = conn.execute(
+            f"SELECT value FROM {META_TABLE} WHERE key = 'data_version'"
+        ).fetchone()
+        return row[0] if row else "0"
+    except sqlite3.OperationalError:
+        return "0"
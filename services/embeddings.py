@@ -0,0 +1,231 @@
+import contextlib
+import os
+import time
+import hashlib
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+DATABASE = os.path.join("instance", "clinical_trials.db")
+MODEL_NAME = "intfloat/multilingual-e5-small"
+SHARDS_DIR = os.path.join("models", "shards")
+REFRESH_LOCK = ".refresh.lock"
+
+# Parametry generowania osadzeń (liczba procesów i wielkość shardu)
+ENCODE_WORKERS = int(os.environ.get("EMBED_WORKERS", os.cpu_count() or 1))
+SHARD_SIZE = int(os.environ.get("EMBED_SHARD_SIZE", 2048))
+
+TRIAL_TEXT_SQL = (
+    'SELECT "NCT Number", "Study Title", "Brief Summary", "Conditions" '
+    "FROM trials ORDER BY rowid"
+)
+
+
+def passage_text(title, summary):
+    """Buduje tekst fragmentu kodowany przez model E5"""
+    return "passage: " + (title or "") + " " + (summary or "")
+
+
+def text_hash(text):
+    """Skrót treści wiersza (16 bajtów) do wykrywania zmian"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def split_conditions(text):
+    """Rozdziela i normalizuje nazwy schorzeń do słownika podpowiedzi"""
+    if not text or not isinstance(text, str):
+        return ()
+
+    parts = (p.strip("., ").capitalize() for p in text.split("|"))
+
+    return tuple(p for p in parts if p)
+
+
+def iter_trial_rows(conn, chunk_size=5000):
+    """Strumieniowo zwraca wiersze (NCT, tytuł, opis, schorzenia) z bazy"""
+    cursor = conn.execute(TRIAL_TEXT_SQL)
+
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+
+        if not rows:
+            break
+
+        yield from rows
+
+
+def database_fingerprint(path=DATABASE):
+    """Znacznik stanu pliku bazy danych (czas modyfikacji i rozmiar)"""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+@contextlib.contextmanager
+def refresh_lock(directory):
+    """Wyłączna blokada aktualizacji osadzeń między procesami (fcntl.flock)
+
+    Na systemach bez fcntl blokada nie jest zakładana.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    with open(os.path.join(directory, REFRESH_LOCK), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+_worker_model = None
+
+
+def _init_worker(model_name, n_threads):
+    """Ładuje osobny model w każdym procesie roboczym"""
+    global _worker_model
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(n_threads)
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _encode_shard(path, ids, hashes, texts, model=None):
+    """Koduje jeden shard i zapisuje go atomowo na dysk"""
+    model = model or _worker_model
+    vectors = model.encode(list(texts), normalize_embeddings=True)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(
+        tmp_path,
+        ids=np.asarray(ids),
+        hashes=np.frombuffer(b"".join(hashes), dtype=np.uint8),
+        vectors=np.asarray(vectors, dtype=np.float32),
+    )
+    os.replace(tmp_path, path)
+
+    return len(ids)
+
+
+def _shard_done(path, hashes):
+    """Sprawdza, czy shard z poprzedniego uruchomienia zawiera te same wiersze"""
+    if not os.path.exists(path):
+        return False
+
+    try:
+        with np.load(path) as data:
+            return data["hashes"].tobytes() == b"".join(hashes)
+    except Exception:
+        return False
+
+
+def _iter_shards(rows, shard_size):
+    shard = []
+
+    for row in rows:
+        shard.append(row)
+
+        if len(shard) == shard_size:
+            yield shard
+            shard = []
+
+    if shard:
+        yield shard
+
+
+def encode_rows(
+    rows,
+    total=None,
+    shard_dir=SHARDS_DIR,
+    workers=ENCODE_WORKERS,
+    shard_size=SHARD_SIZE,
+    model=None,
+):
+    """Koduje strumień wierszy (NCT, skrót, tekst) w shardach na puli procesów
+
+    Każdy gotowy shard trafia na dysk, więc przerwane uruchomienie wznawia
+    pracę od pierwszego brakującego shardu. Zwraca ścieżki shardów w kolejności.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+
+    if total is not None:
+        workers = min(workers, max(1, -(-total // shard_size)))
+
+    # Pula procesów wymaga metody fork (bez ponownego importu aplikacji)
+    executor = None
+    if workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker,
+            initargs=(MODEL_NAME, max(1, (os.cpu_count() or 1) // workers)),
+        )
+
+    paths = []
+    pending = set()
+    progress = {"encoded": 0, "resumed": 0, "start": time.perf_counter()}
+
+    def report(n_rows):
+        progress["encoded"] += n_rows
+        elapsed = time.perf_counter() - progress["start"]
+        done = progress["encoded"] + progress["resumed"]
+        suffix = f"/{total}" if total is not None else ""
+        print(
+            f"Zakodowano {done}{suffix} wierszy "
+            f"({progress['encoded'] / max(elapsed, 1e-9):.1f} wierszy/s)"
+        )
+
+    try:
+        for i, shard in enumerate(_iter_shards(rows, shard_size)):
+            ids, hashes, texts = zip(*shard)
+            path = os.path.join(shard_dir, f"shard_{i:05d}.npz")
+            paths.append(path)
+
+            if _shard_done(path, hashes):
+                progress["resumed"] += len(ids)
+                continue
+
+            if executor is None:
+                if model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    model = SentenceTransformer(MODEL_NAME)
+
+                report(_encode_shard(path, ids, hashes, texts, model))
+                continue
+
+            pending.add(executor.submit(_encode_shard, path, ids, hashes, texts))
+
+            # Ograniczenie liczby shardów oczekujących w pamięci
+            if len(pending) >= workers * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in finished:
+                    report(future.result())
+
+        for future in wait(pending).done:
+            report(future.result())
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    if progress["resumed"]:
+        print(f"Wznowiono z punktu kontrolnego: {progress['resumed']} wierszy")
+
+    return paths
+
+
+def load_shards(paths):
+    """Zwraca kolejno macierze wektorów zapisanych shardów"""
+    for path in paths:
+        with np.load(path) as data:
+            yield data["vectors"]
@@ -0,0 +1,189 @@
+import copy
+import json
+import os
+
+import numpy as np
+
+# Koder zapytań: "sentence-transformers" (model bazowy), "torch-int8"
+# (dynamiczna kwantyzacja warstw liniowych) lub "onnx" (ONNX Runtime)
+QUERY_ENCODER = os.environ.get("QUERY_ENCODER", "sentence-transformers")
+
+# Katalog wyeksportowanego modelu ONNX (build_query_encoder.py)
+ONNX_DIR = os.path.join("models", "query_encoder")
+ONNX_MODEL = os.environ.get("QUERY_ENCODER_ONNX_MODEL", "model_int8.onnx")
+
+# Wątki ONNX Runtime na jedno wywołanie (zapytania są krótkie)
+ONNX_THREADS = int(os.environ.get("QUERY_ENCODER_THREADS", 1))
+
+
+class SentenceTransformerEncoder:
+    """Kodowanie zapytań modelem bazowym (ten sam model co dla osadzeń badań)"""
+
+    name = "sentence-transformers"
+
+    def __init__(self, model):
+        self.model = model
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=True):
+        return self.model.encode(
+            texts, batch_size=batch_size, normalize_embeddings=normalize_embeddings
+        )
+
+
+class TorchInt8Encoder(SentenceTransformerEncoder):
+    """Kopia modelu z warstwami liniowymi skwantyzowanymi dynamicznie do int8"""
+
+    name = "torch-int8"
+
+    def __init__(self, model):
+        import torch
+
+        quantized = torch.quantization.quantize_dynamic(
+            copy.deepcopy(model).cpu(), {torch.nn.Linear}, dtype=torch.qint8
+        )
+        super().__init__(quantized)
+
+
+class OnnxEncoder:
+    """Kodowanie zapytań w ONNX Runtime: tokenizacja, model, pooling i normalizacja
+
+    Pooling (średnia po tokenach z maską uwagi) odpowiada modułowi Pooling
+    modelu E5 w sentence-transformers.
+    """
+
+    name = "onnx"
+
+    def __init__(
+        self, directory=ONNX_DIR, model_file=ONNX_MODEL, threads=ONNX_THREADS
+    ):
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(directory, "config.json"), encoding="utf-8") as f:
+            self.config = json.load(f)
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(directory, model_file),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(directory)
+        self.max_length = self.config["max_seq_length"]
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=True):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        batches = []
+
+        for start in range(0, len(texts), batch_size):
+            tokens = self.tokenizer(
+                texts[start : start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            inputs = {
+                name: value.astype(np.int64)
+                for name, value in tokens.items()
+                if name in self.input_names
+            }
+            hidden = self.session.run(None, inputs)[0]
+
+            # Średnia po tokenach (bez dopełnienia)
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            batches.append(pooled)
+
+        vectors = np.concatenate(batches) if batches else np.empty((0, 0))
+
+        if normalize_embeddings:
+            vectors /= np.maximum(
+                np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12
+            )
+
+        return vectors[0] if single else vectors
+
+
+def export_onnx(model, directory=ONNX_DIR, quantize=True):
+    """Eksportuje transformer modelu do ONNX (oraz wersję int8) wraz z tokenizerem"""
+    import torch
+
+    transformer = model[0]
+    pooling = model[1]
+
+    # Starsze wersje sentence-transformers zapisują tryb jako flagi
+    config = pooling.get_config_dict()
+    mode = config.get("pooling_mode") or (
+        "mean" if config.get("pooling_mode_mean_tokens") else None
+    )
+
+    if mode != "mean":
+        raise ValueError("Eksport obsługuje wyłącznie pooling średnią")
+
+    os.makedirs(directory, exist_ok=True)
+    auto_model = transformer.auto_model.cpu().eval()
+    tokenizer = transformer.tokenizer
+    sample = tokenizer(["query: sample"], return_tensors="pt")
+    input_names = [
+        name
+        for name in ("input_ids", "attention_mask", "token_type_ids")
+        if name in sample
+    ]
+    dynamic_axes = {name: {0: "batch", 1: "tokens"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "tokens"}
+    path = os.path.join(directory, "model.onnx")
+
+    class HiddenStates(torch.nn.Module):
+        """Wejścia przekazywane nazwami (kolejność argumentów zależy od wersji)"""
+
+        def __init__(self):
+            super().__init__()
+            self.model = auto_model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs)))[0]
+
+    with torch.no_grad():
+        torch.onnx.export(
+            HiddenStates().eval(),
+            tuple(sample[name] for name in input_names),
+            path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            dynamo=False,
+        )
+
+    tokenizer.save_pretrained(directory)
+
+    with open(os.path.join(directory, "config.json"), "w", encoding="utf-8") as f:
+        json.dump({"max_seq_length": model.max_seq_length, "pooling": "mean"}, f)
+
+    paths = [path]
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = os.path.join(directory, "model_int8.onnx")
+        quantize_dynamic(path, int8_path, weight_type=QuantType.QInt8)
+        paths.append(int8_path)
+
+    return paths
+
+
+def create_encoder(model, backend=QUERY_ENCODER):
+    """Tworzy koder zapytań; przy błędzie używany jest model bazowy"""
+    try:
+        if backend == "onnx":
+            return OnnxEncoder()
+        if backend == "torch-int8":
+            return TorchInt8Encoder(model)
+    except Exception as e:
+        print(f"Błąd kodera zapytań {backend}, używany jest model bazowy: {e}")
+
+    return SentenceTransformerEncoder(model)
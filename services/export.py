@@ -0,0 +1,169 @@
+import csv
+import io
+import json
+
+from services.database import build_search_query, in_clause
+
+# Liczba wierszy pobieranych z bazy (i grupa wierszy pliku Parquet)
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def trial_columns(conn):
+    """Zwraca kolumny tabeli trials wraz z zadeklarowanymi typami"""
+    return {row[1]: row[2] for row in conn.execute('PRAGMA table_info("trials")')}
+
+
+def select_columns(conn, requested=None):
+    """Wybiera kolumny eksportu, zachowując kolejność z żądania
+
+    Nieznane nazwy kolumn są pomijane; pusta lista oznacza wszystkie kolumny.
+    """
+    available = trial_columns(conn)
+    columns = [col for col in requested or [] if col in available]
+
+    return columns or list(available)
+
+
+def iter_trial_chunks(
+    conn, filters, columns, ranked_ids=None, chunk_size=EXPORT_CHUNK_SIZE
+):
+    """Zwraca kolejne fragmenty wierszy (krotki) spełniających filtry
+
+    Dla zapytań tekstowych wiersze pobierane są partiami w kolejności rankingu
+    `ranked_ids`, w pozostałych przypadkach kursor czytany jest przez fetchmany.
+    """
+    select = ", ".join(f'"{col}"' for col in columns)
+
+    if ranked_ids is not None:
+        for start in range(0, len(ranked_ids), chunk_size):
+            chunk_ids = ranked_ids[start : start + chunk_size]
+            placeholders, params = in_clause(chunk_ids)
+            sql = (
+                f'SELECT "NCT Number", {select} FROM trials '
+                f'WHERE "NCT Number" IN ({placeholders})'
+            )
+            rows = {row[0]: tuple(row)[1:] for row in conn.execute(sql, params)}
+
+            yield [rows[i] for i in chunk_ids if i in rows]
+
+        return
+
+    where_clause, params = build_search_query(filters)
+    cursor = conn.execute(f"SELECT {select} FROM trials WHERE {where_clause}", params)
+
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+
+        if not rows:
+            break
+
+        yield [tuple(row) for row in rows]
+
+
+def stream_csv(columns, chunks):
+    """Zapisuje fragmenty jako CSV (z BOM, aby Excel poprawnie odczytał UTF-8)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    buffer.write("\ufeff")
+    writer.writerow(columns)
+
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def stream_ndjson(columns, chunks):
+    """Zapisuje fragmenty jako NDJSON (jeden obiekt JSON w wierszu)"""
+    for rows in chunks:
+        lines = [
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n"
+            for row in rows
+        ]
+        yield "".join(lines).encode("utf-8")
+
+
+class _ChunkSink:
+    """Strumień tylko do zapisu, z którego odbiera się zapisane bajty"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def stream_parquet(columns, chunks, types=None):
+    """Zapisuje fragmenty jako plik Parquet, każdy fragment jako osobną grupę wierszy"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_types = {"INTEGER": pa.int64(), "REAL": pa.float64()}
+    schema = pa.schema(
+        [(col, arrow_types.get((types or {}).get(col), pa.string())) for col in columns]
+    )
+
+    def convert(value, field):
+        if value is not None and pa.types.is_string(field.type):
+            return str(value)
+        return value
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+
+    try:
+        for rows in chunks:
+            data = {
+                field.name: [convert(row[i], field) for row in rows]
+                for i, field in enumerate(schema)
+            }
+            writer.write_table(pa.Table.from_pydict(data, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+
+    yield sink.drain()
+
+
+def stream_export(conn, export_format, filters, columns, ranked_ids=None):
+    """Zwraca generator bajtów pliku eksportu w wybranym formacie"""
+    chunks = iter_trial_chunks(conn, filters, columns, ranked_ids)
+
+    if export_format == "parquet":
+        types = trial_columns(conn)
+        return stream_parquet(columns, chunks, types)
+
+    if export_format == "ndjson":
+        return stream_ndjson(columns, chunks)
+
+    return stream_csv(columns, chunks)
@@ -0,0 +1,160 @@
+import os
+
+import numpy as np
+
+from services.database import FACET_COLUMNS, FACET_TABLES
+
+# Filtry obsługiwane przez mapy bitowe (w kolejności wyświetlania)
+FACET_KEYS = ["status", "phase", "type", "age", "sex"]
+
+SEPARATOR = "\x1f"
+
+
+class FacetIndex:
+    """Mapy bitowe wartości filtrów wyrównane z wierszami macierzy osadzeń"""
+
+    def __init__(self, bitmaps, n_rows, meta=None):
+        self.bitmaps = bitmaps
+        self.n_rows = n_rows
+        self.meta = meta or {}
+
+    @classmethod
+    def build(cls, conn, ids, meta=None):
+        """Buduje mapy bitowe dla podanej kolejności numerów NCT"""
+        positions = {nct_id: i for i, nct_id in enumerate(ids)}
+        n_rows = len(positions)
+        bitmaps = {}
+
+        for key in FACET_KEYS:
+            if key in FACET_COLUMNS:
+                sql = f'SELECT "NCT Number", "{FACET_COLUMNS[key]}" FROM trials'
+            else:
+                table, col_name = FACET_TABLES[key][:2]
+                sql = f'SELECT "NCT Number", "{col_name}" FROM {table}'
+
+            values = {}
+
+            for nct_id, value in conn.execute(sql):
+                row = positions.get(nct_id)
+
+                if row is None or value is None or value == "":
+                    continue
+
+                values.setdefault(value, []).append(row)
+
+            bitmaps[key] = {}
+
+            for value, rows in values.items():
+                bitmap = np.zeros(n_rows, dtype=bool)
+                bitmap[rows] = True
+                bitmaps[key][value] = bitmap
+
+        return cls(bitmaps, n_rows, meta)
+
+    def save(self, path):
+        """Zapisuje mapy bitowe w postaci spakowanej (plik tymczasowy i podmiana)"""
+        names, packed = [], []
+
+        for key, values in self.bitmaps.items():
+            for value, bitmap in values.items():
+                names.append(f"{key}{SEPARATOR}{value}")
+                packed.append(np.packbits(bitmap))
+
+        packed = np.stack(packed) if packed else np.zeros((0, 0), dtype=np.uint8)
+        meta = [f"{k}{SEPARATOR}{v}" for k, v in self.meta.items()]
+
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path,
+            n_rows=np.array(self.n_rows),
+            names=np.array(names, dtype=str),
+            packed=packed,
+            meta=np.array(meta, dtype=str),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Wczytuje mapy bitowe z dysku"""
+        with np.load(path) as data:
+            n_rows = int(data["n_rows"])
+            meta = dict(m.split(SEPARATOR, 1) for m in data["meta"].tolist())
+            bitmaps = {key: {} for key in FACET_KEYS}
+
+            for name, packed in zip(data["names"].tolist(), data["packed"]):
+                key, value = name.split(SEPARATOR, 1)
+                bitmap = np.unpackbits(packed, count=n_rows).astype(bool)
+                bitmaps.setdefault(key, {})[value] = bitmap
+
+        return cls(bitmaps, n_rows, meta)
+
+    def values(self, key):
+        """Dostępne wartości filtra"""
+        return sorted(self.bitmaps.get(key, {}))
+
+    def _facet_masks(self, filters, rows=None):
+        """Maski poszczególnych filtrów (opcjonalnie ograniczone do wierszy `rows`)"""
+        size = self.n_rows if rows is None else len(rows)
+        masks = {}
+
+        for key in FACET_KEYS:
+            selected = (filters or {}).get(key)
+
+            if not selected:
+                continue
+
+            facet_mask = np.zeros(size, dtype=bool)
+
+            for value in selected:
+                bitmap = self.bitmaps.get(key, {}).get(value)
+
+                if bitmap is not None:
+                    facet_mask |= bitmap if rows is None else bitmap[rows]
+
+            masks[key] = facet_mask
+
+        return masks
+
+    def mask(self, filters):
+        """Maska wierszy spełniających filtry (lub None, gdy brak filtrów)
+
+        Wartości jednego filtra łączy alternatywa, różne filtry - koniunkcja.
+        """
+        mask = None
+
+        for facet_mask in self._facet_masks(filters).values():
+            mask = facet_mask if mask is None else mask & facet_mask
+
+        return mask
+
+    def counts(self, filters=None, rows=None, limit=None):
+        """Liczby wyników dla każdej wartości wszystkich filtrów w jednym przebiegu
+
+        Liczności filtra uwzględniają pozostałe wybrane filtry, ale nie jego
+        własne zaznaczenia. `rows` ogranicza zliczanie do podanych wierszy,
+        a `limit` obcina liczności do liczby zwracanych wyników.
+        """
+        size = self.n_rows if rows is None else len(rows)
+        facet_masks = self._facet_masks(filters, rows)
+        counts = {}
+
+        for key in FACET_KEYS:
+            base = np.ones(size, dtype=bool)
+
+            for other, facet_mask in facet_masks.items():
+                if other != key:
+                    base &= facet_mask
+
+            counts[key] = {
+                value: int(
+                    np.count_nonzero(base & (bitmap if rows is None else bitmap[rows]))
+                )
+                for value, bitmap in self.bitmaps.get(key, {}).items()
+            }
+
+            if limit is not None:
+                counts[key] = {
+                    value: min(count, limit) for value, count in counts[key].items()
+                }
+
+        return counts
@@ -0,0 +1,108 @@
+import re
+
+from services.database import build_search_query
+
+# Indeks pełnotekstowy FTS5 (zewnętrzna treść: tabela trials)
+FTS_TABLE = "trials_fts"
+
+# Kolumny indeksu i ich wagi w rankingu BM25
+FTS_COLUMNS = {
+    "Study Title": 10.0,
+    "Brief Summary": 1.0,
+    "Conditions": 5.0,
+    "Interventions": 3.0,
+}
+
+# Stała wygładzająca fuzji rang (RRF)
+RRF_K = 60
+
+NCT_PATTERN = re.compile(r"NCT\d{8}", re.IGNORECASE)
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def build_fts_index(conn):
+    """Tworzy indeks FTS5 dla bieżącej zawartości tabeli trials"""
+    columns = ", ".join(f'"{col}"' for col in FTS_COLUMNS)
+
+    conn.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    conn.execute(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({columns}, "
+        "content='trials', content_rowid='rowid', "
+        "tokenize='unicode61 remove_diacritics 2')"
+    )
+    conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')")
+
+
+def parse_nct_ids(query_text):
+    """Zwraca numery NCT, jeśli zapytanie składa się wyłącznie z nich (lub None)"""
+    tokens = [t for t in re.split(r"[\s,;]+", query_text.strip()) if t]
+
+    if tokens and all(NCT_PATTERN.fullmatch(t) for t in tokens):
+        return list(dict.fromkeys(t.upper() for t in tokens))
+
+    return None
+
+
+def fts_query(query_text):
+    """Buduje wyrażenie MATCH: słowa zapytania w cudzysłowach połączone przez OR"""
+    tokens = list(dict.fromkeys(TOKEN_PATTERN.findall(query_text.lower())))
+
+    return " OR ".join(f'"{token}"' for token in tokens)
+
+
+def fetch_bm25(conn, query_text, limit=100, filters=None):
+    """Zwraca numery NCT i wyniki BM25 (większy = lepszy) w kolejności rankingu
+
+    Opcjonalne filtry (bez zapytania tekstowego) zawężają wyniki w SQL.
+    """
+    match = fts_query(query_text)
+
+    if not match:
+        return []
+
+    where_clause, params = build_search_query(
+        {key: value for key, value in (filters or {}).items() if key != "q"}
+    )
+    weights = ", ".join(str(w) for w in FTS_COLUMNS.values())
+    sql = (
+        f'SELECT t."NCT Number", -bm25({FTS_TABLE}, {weights}) AS score '
+        f"FROM {FTS_TABLE} JOIN trials t ON t.rowid = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH ? AND {where_clause} ORDER BY score DESC LIMIT ?"
+    )
+
+    try:
+        rows = conn.execute(sql, [match] + params + [limit])
+        return [(row[0], row[1]) for row in rows]
+    except Exception as e:
+        print(f"Błąd wyszukiwania pełnotekstowego: {e}")
+        return []
+
+
+def fetch_matches(conn, query_text):
+    """Zwraca numery NCT wszystkich dopasowań zapytania (bez oceny BM25)"""
+    match = fts_query(query_text)
+
+    if not match:
+        return []
+
+    sql = (
+        f'SELECT t."NCT Number" FROM {FTS_TABLE} '
+        f"JOIN trials t ON t.rowid = {FTS_TABLE}.rowid WHERE {FTS_TABLE} MATCH ?"
+    )
+
+    try:
+        return [row[0] for row in conn.execute(sql, [match])]
+    except Exception as e:
+        print(f"Błąd wyszukiwania pełnotekstowego: {e}")
+        return []
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Łączy rankingi metodą RRF: suma 1 / (k + pozycja) po wszystkich listach"""
+    scores = {}
+
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+
+    return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
@@ -0,0 +1,116 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from services.metrics import cache_requests
+
+# Limit pamięci zapamiętanych wektorów i rankingów zapytań (w bajtach)
+MEMO_MAX_BYTES = int(os.environ.get("SEARCH_MEMO_MAX_BYTES", 64 * 1024 * 1024))
+
+
+def normalize_query(query_text):
+    """Klucz zapytania: tekst bez nadmiarowych spacji"""
+    return " ".join(query_text.split())
+
+
+def _size(value):
+    """Przybliżony rozmiar wpisu w bajtach (tablice numpy liczone dokładnie)"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(_size(v) for v in value) + 64
+
+    return 64
+
+
+class QueryMemo:
+    """LRU wektorów i rankingów zapytań ograniczony łącznym rozmiarem wpisów
+
+    Wpisy należą do jednej wersji magazynu osadzeń; zmiana wersji czyści
+    całą pamięć. Trafienia i chybienia liczone są osobno dla rodzajów wpisów.
+    Limit 0 wyłącza pamięć (każde wyszukiwanie koduje i przeszukuje od nowa).
+    """
+
+    def __init__(self, max_bytes=MEMO_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.version = None
+        self.hits = {}
+        self.misses = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def _check_version(self, version):
+        if version != self.version:
+            self.entries.clear()
+            self.bytes = 0
+            self.version = version
+
+    def get(self, kind, key, version):
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            self._check_version(version)
+            entry = self.entries.get((kind, key))
+
+            if entry is None:
+                self.misses[kind] = self.misses.get(kind, 0) + 1
+            else:
+                self.entries.move_to_end((kind, key))
+                self.hits[kind] = self.hits.get(kind, 0) + 1
+
+        cache_requests.inc(f"memo_{kind}", "miss" if entry is None else "hit")
+
+        return None if entry is None else entry[0]
+
+    def put(self, kind, key, version, value):
+        size = _size(value)
+
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._check_version(version)
+            old = self.entries.pop((kind, key), None)
+
+            if old is not None:
+                self.bytes -= old[1]
+
+            self.entries[(kind, key)] = (value, size)
+            self.bytes += size
+
+            # Usuwanie najdawniej używanych wpisów do zmieszczenia się w limicie
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.bytes -= evicted
+
+    def stats(self):
+        """Liczba i rozmiar wpisów oraz skuteczność dla każdego rodzaju wpisów"""
+        with self._lock:
+            kinds = sorted(set(self.hits) | set(self.misses))
+
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hit_rate": {
+                    kind: round(
+                        self.hits.get(kind, 0)
+                        / max(self.hits.get(kind, 0) + self.misses.get(kind, 0), 1),
+                        3,
+                    )
+                    for kind in kinds
+                },
+            }
@@ -0,0 +1,153 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Granice przedziałów histogramów czasu (w sekundach)
+BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+
+METRICS_PREFIX = "clinicalscope"
+
+# Etapy zmierzone w bieżącym żądaniu (lista par: nazwa, czas w sekundach)
+_request_timings = ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    """Histogram czasów w formacie Prometheus (osobne serie dla etykiet)"""
+
+    def __init__(self, name, help_text, label, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, seconds):
+        with self._lock:
+            if label_value not in self.series:
+                self.series[label_value] = ([0] * (len(self.buckets) + 1), 0.0)
+
+            counts, total = self.series[label_value]
+            counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.series[label_value] = (counts, total + seconds)
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+
+        with self._lock:
+            series = {key: (list(c), t) for key, (c, t) in self.series.items()}
+
+        for label_value, (counts, total) in sorted(series.items()):
+            labels = f'{self.label}="{label_value}"'
+            cumulative = 0
+
+            for bound, count in zip(self.buckets + ["+Inf"], counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+
+            lines.append(f"{self.name}_sum{{{labels}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+
+        return lines
+
+
+class Counter:
+    """Licznik w formacie Prometheus z etykietami"""
+
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values):
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + 1
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} counter",
+        ]
+
+        with self._lock:
+            values = dict(self.values)
+
+        for label_values, value in sorted(values.items()):
+            labels = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, label_values))
+            lines.append(f"{self.name}{{{labels}}} {value}")
+
+        return lines
+
+
+stage_duration = Histogram(
+    f"{METRICS_PREFIX}_stage_duration_seconds",
+    "Czas etapów obsługi żądania",
+    "stage",
+)
+request_duration = Histogram(
+    f"{METRICS_PREFIX}_request_duration_seconds",
+    "Czas obsługi żądania według punktu końcowego",
+    "endpoint",
+)
+cache_requests = Counter(
+    f"{METRICS_PREFIX}_cache_requests_total",
+    "Odczyty pamięci podręcznej według przestrzeni kluczy i wyniku",
+    ["namespace", "result"],
+)
+
+
+@contextmanager
+def timed(stage):
+    """Mierzy czas etapu: histogram oraz nagłówek Server-Timing bieżącego żądania"""
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_duration.observe(stage, elapsed)
+
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+
+def start_request():
+    """Rozpoczyna zbieranie etapów bieżącego żądania"""
+    _request_timings.set([])
+
+
+def server_timing_header(total=None):
+    """Buduje nagłówek Server-Timing (czasy etapów o tej samej nazwie są sumowane)"""
+    durations = {}
+
+    for stage, elapsed in _request_timings.get() or []:
+        durations[stage] = durations.get(stage, 0.0) + elapsed
+
+    if total is not None:
+        durations["total"] = total
+
+    _request_timings.set(None)
+
+    return ", ".join(
+        f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in durations.items()
+    )
+
+
+def render_metrics():
+    """Wszystkie metryki w formacie tekstowym Prometheus"""
+    lines = []
+
+    for metric in (stage_duration, request_duration, cache_requests):
+        lines.extend(metric.render())
+
+    return "\n".join(lines) + "\n"
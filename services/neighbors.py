@@ -0,0 +1,211 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Liczba sąsiadów zapisywanych dla każdego badania
+NEIGHBORS_K = int(os.environ.get("NEIGHBORS_K", 20))
+
+# Wątki oraz liczba wierszy-zapytań mnożonych naraz przez całą macierz
+NEIGHBORS_WORKERS = int(os.environ.get("NEIGHBORS_WORKERS", os.cpu_count() or 1))
+NEIGHBORS_BLOCK_SIZE = 256
+
+# Powyżej tego udziału zmienionych wierszy graf budowany jest od nowa
+INCREMENTAL_LIMIT = 0.25
+
+
+class NeighborGraph:
+    """Lista k najbliższych sąsiadów każdego wiersza macierzy osadzeń
+
+    Pozycje sąsiadów (int32) i podobieństwa (float16) są odczytywane przez
+    numpy.memmap, a klucze (numery NCT i skróty treści) pozwalają wykryć
+    zmienione wiersze przy aktualizacji. Brak sąsiada oznacza pozycja -1.
+    """
+
+    def __init__(self, rows, scores, ids, hashes):
+        self.rows = rows
+        self.scores = scores
+        self.ids = ids
+        self.hashes = hashes
+
+    @property
+    def k(self):
+        return self.rows.shape[1]
+
+    @staticmethod
+    def paths(directory):
+        return {
+            "rows": os.path.join(directory, "neighbors.npy"),
+            "scores": os.path.join(directory, "neighbor_scores.npy"),
+            "keys": os.path.join(directory, "neighbor_keys.npz"),
+        }
+
+    @classmethod
+    def load(cls, directory):
+        paths = cls.paths(directory)
+        keys = np.load(paths["keys"])
+
+        return cls(
+            np.load(paths["rows"], mmap_mode="r"),
+            np.load(paths["scores"], mmap_mode="r"),
+            keys["ids"],
+            keys["hashes"],
+        )
+
+    def save(self, directory):
+        """Zapisuje graf (pliki tymczasowe podmieniane na końcu)"""
+        paths = self.paths(directory)
+
+        for name, array in (("rows", self.rows), ("scores", self.scores)):
+            with open(paths[name] + ".tmp", "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+
+        with open(paths["keys"] + ".tmp", "wb") as f:
+            np.savez(f, ids=self.ids, hashes=self.hashes)
+
+        for path in paths.values():
+            os.replace(path + ".tmp", path)
+
+    def matches(self, store):
+        """Czy graf odpowiada bieżącej zawartości magazynu osadzeń"""
+        return (
+            store.hashes is not None
+            and len(self.ids) == len(store)
+            and np.array_equal(self.ids, store.ids)
+            and np.array_equal(self.hashes, store.hashes)
+        )
+
+    def neighbors(self, row, top_n=None):
+        """Pozycje i podobieństwa sąsiadów wiersza (odczyt bez przeszukiwania)"""
+        rows = np.asarray(self.rows[row])
+        valid = rows >= 0
+        rows, scores = rows[valid], np.asarray(self.scores[row])[valid]
+
+        return rows[:top_n], scores[:top_n].astype(np.float32)
+
+
+def _block_neighbors(store, rows, k):
+    """Sąsiedzi wskazanych wierszy względem całej macierzy (bez samego wiersza)"""
+    best_rows, best_scores = store.top_k_batch(store.vectors(rows), k + 1)
+    out_rows = np.full((len(rows), k), -1, dtype=np.int32)
+    out_scores = np.zeros((len(rows), k), dtype=np.float16)
+
+    for i, row in enumerate(rows):
+        keep = best_rows[i] != row
+        found = best_rows[i][keep][:k]
+        out_rows[i, : len(found)] = found
+        out_scores[i, : len(found)] = best_scores[i][keep][:k]
+
+    return out_rows, out_scores
+
+
+def compute_neighbors(store, rows, k=NEIGHBORS_K, workers=NEIGHBORS_WORKERS):
+    """Sąsiedzi wierszy liczeni blokami (iloczyn macierzy) w puli wątków"""
+    rows = np.asarray(rows, dtype=np.int64)
+    blocks = [
+        rows[start : start + NEIGHBORS_BLOCK_SIZE]
+        for start in range(0, len(rows), NEIGHBORS_BLOCK_SIZE)
+    ]
+    out_rows = np.full((len(rows), k), -1, dtype=np.int32)
+    out_scores = np.zeros((len(rows), k), dtype=np.float16)
+
+    # Mnożenie macierzy w numpy zwalnia GIL, więc wątki pracują równolegle
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(lambda block: _block_neighbors(store, block, k), blocks)
+
+        for n, (block_rows, block_scores) in enumerate(results):
+            start = n * NEIGHBORS_BLOCK_SIZE
+            out_rows[start : start + len(block_rows)] = block_rows
+            out_scores[start : start + len(block_rows)] = block_scores
+
+    return out_rows, out_scores
+
+
+def _merge_changed(store, graph_rows, graph_scores, rows, changed, k):
+    """Łączy dotychczasowych sąsiadów wierszy z podobieństwem do zmienionych wierszy"""
+    changed_vectors = store.vectors(changed)
+
+    for start in range(0, len(rows), NEIGHBORS_BLOCK_SIZE):
+        block = rows[start : start + NEIGHBORS_BLOCK_SIZE]
+        vectors = store.vectors(block)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        candidate_rows = np.concatenate(
+            [graph_rows[block], np.broadcast_to(changed, (len(block), len(changed)))],
+            axis=1,
+        )
+        candidate_scores = np.concatenate(
+            [graph_scores[block].astype(np.float32), vectors @ changed_vectors.T],
+            axis=1,
+        )
+        candidate_scores[candidate_rows < 0] = -np.inf
+
+        order = np.argsort(-candidate_scores, axis=1, kind="stable")[:, :k]
+        graph_rows[block] = np.take_along_axis(candidate_rows, order, axis=1)
+        graph_scores[block] = np.take_along_axis(candidate_scores, order, axis=1)
+
+
+def build_graph(store, previous=None, k=NEIGHBORS_K, workers=NEIGHBORS_WORKERS):
+    """Buduje graf sąsiadów; przy niewielu zmianach aktualizuje poprzedni graf
+
+    Zwraca graf oraz liczbę wierszy, których sąsiedzi zostali policzeni od nowa.
+    """
+    n_rows = len(store)
+    hashes = store.hashes if store.hashes is not None else np.empty((n_rows, 0))
+    ids = np.asarray(store.ids)
+    hashes = np.asarray(hashes)
+
+    old_positions = {}
+    if previous is not None and previous.k == k:
+        old_positions = {nct_id: i for i, nct_id in enumerate(previous.ids)}
+
+    # Odwzorowanie pozycji: stary wiersz -> nowy wiersz (-1 dla usuniętych)
+    old_to_new = np.full(len(previous.ids) if old_positions else 0, -1, dtype=np.int64)
+    changed = []
+
+    for row, nct_id in enumerate(ids):
+        old_row = old_positions.get(nct_id)
+
+        if old_row is None or not np.array_equal(previous.hashes[old_row], hashes[row]):
+            changed.append(row)
+
+        if old_row is not None:
+            old_to_new[old_row] = row
+
+    if not old_positions or len(changed) > INCREMENTAL_LIMIT * n_rows:
+        rows, scores = compute_neighbors(store, range(n_rows), k, workers)
+        return NeighborGraph(rows, scores, ids, hashes), n_rows
+
+    # Przeniesienie starych list na nowe pozycje
+    graph_rows = np.full((n_rows, k), -1, dtype=np.int32)
+    graph_scores = np.zeros((n_rows, k), dtype=np.float16)
+    moved = old_to_new >= 0
+    graph_rows[old_to_new[moved]] = previous.rows[moved]
+    graph_scores[old_to_new[moved]] = previous.scores[moved]
+
+    # Przeliczenie pozycji sąsiadów; usunięci lub zmienieni sąsiedzi tracą ważność
+    is_changed = np.zeros(n_rows, dtype=bool)
+    is_changed[changed] = True
+    valid = graph_rows >= 0
+    remapped = np.where(valid, old_to_new[np.where(valid, graph_rows, 0)], -1)
+    invalid = valid & ((remapped < 0) | is_changed[np.maximum(remapped, 0)])
+    graph_rows = remapped.astype(np.int32)
+
+    # Zmienione wiersze i wiersze z nieważnymi sąsiadami liczone są od nowa,
+    # pozostałe uzupełniane są tylko o podobieństwo do zmienionych wierszy
+    recompute_mask = is_changed | invalid.any(axis=1)
+    recompute = np.flatnonzero(recompute_mask)
+    kept = np.flatnonzero(~recompute_mask)
+
+    if len(changed) and len(kept):
+        _merge_changed(
+            store, graph_rows, graph_scores, kept, np.asarray(changed), k
+        )
+
+    if len(recompute):
+        rows, scores = compute_neighbors(store, recompute, k, workers)
+        graph_rows[recompute] = rows
+        graph_scores[recompute] = scores
+
+    return NeighborGraph(graph_rows, graph_scores, ids, hashes), len(recompute)
+
@@ -0,0 +1,60 @@
+import os
+import sys
+import threading
+import time
+
+# Katalog zapisu profili (format "collapsed stacks" dla flamegraph/speedscope)
+PROFILES_DIR = "profiles"
+SAMPLE_INTERVAL = 0.001
+
+
+class SamplingProfiler:
+    """Próbkuje stos wskazanego wątku w stałych odstępach czasu"""
+
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"
+                )
+                frame = frame.f_back
+
+            key = ";".join(reversed(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+        if self._thread is not None:
+            self._thread.join()
+
+    def save(self, name):
+        """Zapisuje zebrane stosy i zwraca ścieżkę pliku"""
+        os.makedirs(PROFILES_DIR, exist_ok=True)
+        path = os.path.join(PROFILES_DIR, f"{name}-{int(time.time() * 1000)}.txt")
+
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.stacks.items(), key=lambda x: -x[1]):
+                f.write(f"{stack} {count}\n")
+
+        return path
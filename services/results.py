@@ -0,0 +1,41 @@
+import math
+
+
+class ResultSet:
+    """Uporządkowana lista wyników wyszukiwania (numery NCT i ich podobieństwo)"""
+
+    def __init__(self, ids, scores=None, facet_counts=None):
+        self.ids = list(ids)
+        self.scores = list(scores) if scores is not None else [None] * len(self.ids)
+        self.facet_counts = facet_counts
+
+    def __len__(self):
+        return len(self.ids)
+
+    def total_pages(self, per_page):
+        return math.ceil(len(self.ids) / per_page)
+
+    def page_ids(self, page, per_page):
+        """Numery NCT wskazanej strony w kolejności rankingu"""
+        offset = (max(page, 1) - 1) * per_page
+        return self.ids[offset : offset + per_page]
+
+    def filtered(self, allowed_ids):
+        """Zawęża wyniki do dozwolonych numerów NCT, zachowując ranking"""
+        pairs = [(i, s) for i, s in zip(self.ids, self.scores) if i in allowed_ids]
+
+        return ResultSet(
+            [i for i, _ in pairs], [s for _, s in pairs], self.facet_counts
+        )
+
+    def to_dict(self):
+        return {
+            "ids": self.ids,
+            "scores": self.scores,
+            "facet_counts": self.facet_counts,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["ids"], data["scores"], data.get("facet_counts"))
+
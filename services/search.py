@@ -1,122 +1,767 @@
+import hashlib
 import os
-import sqlite3
+import shutil
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import joblib
-import torch
-import pandas as pd
-from sentence_transformers import SentenceTransformer, util
+import numpy as np
 from thefuzz import process, fuzz
 
-DATABASE = os.path.join("instance", "clinical_trials.db")
+from services.ann import IVFIndex
+from services.database import pool
+from services.encoder import create_encoder
+from services.facets import FACET_KEYS, FacetIndex
+from services.lexical import (
+    fetch_bm25,
+    fetch_matches,
+    parse_nct_ids,
+    reciprocal_rank_fusion,
+)
+from services.memo import QueryMemo, normalize_query
+from services.neighbors import NeighborGraph
+from services.metrics import timed
+from services.embeddings import (
+    MODEL_NAME,
+    SHARDS_DIR,
+    database_fingerprint,
+    encode_rows,
+    iter_trial_rows,
+    load_shards,
+    passage_text,
+    refresh_lock,
+    split_conditions,
+    text_hash,
+)
+from services.store import EmbeddingStore, top_k
+from services.suggest import TrigramIndex
+
+# Rodzaj indeksu wektorowego: "exact" (pełne przeszukanie) lub "ivf" (przybliżony)
+INDEX_TYPE = os.environ.get("SEARCH_INDEX", "exact")
+IVF_N_PROBE = int(os.environ.get("SEARCH_IVF_NPROBE", 16))
+
+# Pełne przeszukanie: macierz dzielona na shardy o stałej liczbie wierszy,
+# oceniane równolegle w puli wątków
+SEARCH_SHARD_ROWS = int(os.environ.get("SEARCH_SHARD_ROWS", 20000))
+SEARCH_THREADS = int(os.environ.get("SEARCH_THREADS", os.cpu_count() or 1))
+
+# Tryb rankingu: "semantic", "lexical" (BM25) lub "hybrid" (fuzja rang RRF)
+SEARCH_MODES = ("semantic", "lexical", "hybrid")
+SEARCH_MODE = os.environ.get("SEARCH_MODE", "hybrid")
+
+# Liczba wyników BM25 łączonych z rankingiem semantycznym
+LEXICAL_CANDIDATES = 300
+
+# Zapytania jednowyrazowe do tej długości pomijają model, jeśli BM25 coś znalazł
+SHORT_QUERY_LENGTH = 4
+
+# Wyszukiwanie wsadowe: zapytania oceniane jednym iloczynem macierzy
+# oraz rozmiar partii przy kodowaniu zapytań modelem
+QUERY_BATCH_SIZE = int(os.environ.get("SEARCH_QUERY_BATCH_SIZE", 256))
+ENCODE_BATCH_SIZE = 64
+
+# Liczba najlepszych wierszy zapamiętywanych dla zapytania (bez filtrów);
+# strony, filtry i eksporty tego samego zapytania korzystają z jednego przeszukania
+MEMO_CANDIDATES = 1000
+
+# Liczba kandydatów ocenianych przez WRatio w podpowiedziach literówek
+SUGGESTION_CANDIDATES = 50
+
+# Format macierzy osadzeń na dysku: "int8" lub "float16"
+STORE_DTYPE = os.environ.get("SEARCH_STORE_DTYPE", "int8")
 
 
 class SearchEngine:
-    def __init__(self):
+    def __init__(self, progress=None, encode_workers=1):
+        # Import biblioteki modelu (wraz z torch) dopiero przy tworzeniu silnika
+        from sentence_transformers import SentenceTransformer
+
+        progress = progress or (lambda stage: None)
+
+        # W procesie serwera osadzenia są kodowane załadowanym modelem; pula
+        # procesów (fork) jest używana tylko przez build_embeddings.py
+        self.encode_workers = encode_workers
         self.models_dir = "models"
-        self.matrix_path = os.path.join(self.models_dir, "embeddings_matrix.joblib")
+        self.store_path = os.path.join(self.models_dir, "embeddings.bin")
+        self.legacy_matrix_path = os.path.join(
+            self.models_dir, "embeddings_matrix.joblib"
+        )
         self.conditions_path = os.path.join(self.models_dir, "unique_conditions.joblib")
+        self.index_path = os.path.join(self.models_dir, "ivf_index.npz")
+        self.facets_path = os.path.join(self.models_dir, "facets.npz")
 
         if not os.path.exists(self.models_dir):
             os.makedirs(self.models_dir)
 
-        self.model = SentenceTransformer("intfloat/multilingual-e5-small")
-        self.matrix = None
-        self.df = None
+        progress("model")
+        self.model = SentenceTransformer(MODEL_NAME)
+        self.query_encoder = create_encoder(self.model)
+        self.store = None
         self.unique_conditions = []
+        self.suggestions = TrigramIndex([])
+        self.index = None
+        self.facets = None
+        self.neighbors = None
+        self.memo = QueryMemo()
+        self.executor = ThreadPoolExecutor(
+            max_workers=SEARCH_THREADS, thread_name_prefix="search-shard"
+        )
 
         print("Inicjalizowanie silnika wyszukiwania semantycznego...")
+        progress("embeddings")
         self._load_and_train()
+
+        progress("facets")
+        self._load_facets()
+        self._load_neighbors()
+
+        if INDEX_TYPE == "ivf":
+            progress("index")
+            self._load_index()
+
         print("Silnik gotowy!")
 
+    @property
+    def version(self):
+        """Wersja wyników silnika: osadzenia, indeks i ustawienia rankingu"""
+        parts = [
+            self.store.version if self.store is not None else "",
+            self.index.n_lists if self.index is not None else "",
+            SEARCH_MODE,
+            INDEX_TYPE,
+            IVF_N_PROBE,
+            self.query_encoder.name,
+        ]
+        digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+
+        return digest[:12]
+
     def _load_and_train(self):
-        """Ładuje osadzenia z dysku lub generuje nowe"""
-        cache_exists = os.path.exists(self.matrix_path) and os.path.exists(
-            self.conditions_path
+        """Ładuje osadzenia z dysku i aktualizuje je, jeśli baza się zmieniła"""
+        if os.path.exists(self.legacy_matrix_path) and not os.path.exists(
+            self.store_path
+        ):
+            self._convert_legacy_matrix()
+
+        print("Wczytywanie zapisanych osadzeń i słownika...")
+        self._load_saved()
+
+        if self._up_to_date():
+            return
+
+        try:
+            # Jeden proces aktualizuje osadzenia; pozostałe czekają na blokadzie
+            # i wczytują zapisany przez niego wynik
+            with refresh_lock(self.models_dir):
+                self._load_saved()
+
+                if self._up_to_date():
+                    print("Osadzenia zaktualizowane przez inny proces")
+                    return
+
+                self.refresh()
+        except Exception as e:
+            print(f"Błąd podczas generowania osadzeń: {e}")
+
+    def _load_saved(self):
+        """Otwiera zapisane osadzenia i słownik schorzeń (jeśli istnieją)"""
+        if os.path.exists(self.store_path):
+            self.store = EmbeddingStore.open(self.store_path)
+
+        if os.path.exists(self.conditions_path):
+            self._load_conditions()
+
+    def _up_to_date(self):
+        """Baza nie zmieniła się od ostatniego zapisu osadzeń"""
+        return (
+            self.store is not None
+            and bool(self.unique_conditions)
+            and self.store.meta.get("source") == database_fingerprint()
         )
 
-        if cache_exists:
-            print("Wczytywanie zapisanych osadzeń i słownika...")
-            self.matrix = joblib.load(self.matrix_path)
-            self.unique_conditions = joblib.load(self.conditions_path)
+    def _load_conditions(self):
+        """Wczytuje listę unikalnych schorzeń (słownik podpowiedzi)"""
+        data = joblib.load(self.conditions_path)
+
+        # Starszy format: schorzenia wierszy wraz z licznikami wystąpień
+        if isinstance(data, dict):
+            data = [c for c, count in data["counts"].items() if count > 0]
+
+        self.unique_conditions = list(data)
+        self.suggestions = TrigramIndex(self.unique_conditions)
+
+    def refresh(self):
+        """Przelicza osadzenia tylko dla wierszy dodanych lub zmienionych"""
+        print("Aktualizowanie osadzeń...")
+        old_store = self.store
+        old_rows = {}
+
+        if old_store is not None and old_store.hashes is not None:
+            for i, nct_id in enumerate(old_store.ids):
+                old_rows[nct_id.decode()] = i
+
+        ids, hashes, kept_rows = [], [], []
+        to_encode = set()
+        seen = set()
+        condition_counts = Counter()
+
+        conn = pool.connection()
+
+        for nct_id, title, summary, conditions in iter_trial_rows(conn):
+            text = passage_text(title, summary)
+            digest = text_hash(text)
+            row = old_rows.get(nct_id)
+
+            if row is not None and old_store.row_hash(row) == digest:
+                kept_rows.append(row)
+            else:
+                kept_rows.append(-1)
+                to_encode.add(nct_id)
+
+            ids.append(nct_id)
+            hashes.append(digest)
+            seen.add(nct_id)
+
+            # Słownik schorzeń liczony od nowa w tym samym przebiegu po bazie
+            condition_counts.update(split_conditions(conditions))
+
+        self.unique_conditions = list(condition_counts)
+        self.suggestions = TrigramIndex(self.unique_conditions)
+
+        kept_rows = np.asarray(kept_rows, dtype=np.int64)
+        is_new = kept_rows < 0
+        deleted = sum(1 for nct_id in old_rows if nct_id not in seen)
+        print(
+            f"Wiersze: {len(ids)}, do zakodowania: {len(to_encode)}, usunięte: {deleted}"
+        )
+
+        # Zakodowanie wyłącznie nowych i zmienionych tekstów (drugi przebieg po bazie)
+        texts = (
+            (row[0], passage_text(row[1], row[2]))
+            for row in iter_trial_rows(conn)
+            if row[0] in to_encode
+        )
+        shard_paths = encode_rows(
+            ((nct_id, text_hash(text), text) for nct_id, text in texts),
+            total=len(to_encode),
+            workers=self.encode_workers,
+            model=self.model,
+        )
 
-            conn = sqlite3.connect(DATABASE)
-            self.df = pd.read_sql('SELECT "NCT Number" FROM trials', conn)
-            conn.close()
+        new_blocks = list(load_shards(shard_paths))
+        if new_blocks:
+            dim = new_blocks[0].shape[1]
+        else:
+            dim = old_store.dim if old_store is not None else 0
 
+        vectors = np.empty((len(ids), dim), dtype=np.float32)
+
+        if (~is_new).any():
+            vectors[~is_new] = old_store.vectors(kept_rows[~is_new])
+        if new_blocks:
+            vectors[is_new] = np.concatenate(new_blocks)
+
+        # Zapisanie na dysk: słownik przed macierzą, bo to metadane macierzy
+        # decydują, czy inne procesy uznają osadzenia za aktualne
+        tmp_path = f"{self.conditions_path}.{os.getpid()}.tmp"
+        joblib.dump(self.unique_conditions, tmp_path)
+        os.replace(tmp_path, self.conditions_path)
+
+        self.store = EmbeddingStore.write(
+            self.store_path,
+            ids,
+            vectors,
+            dtype=STORE_DTYPE,
+            hashes=hashes,
+            meta={"source": database_fingerprint()},
+        )
+
+        # Shardy usuwane pod blokadą aktualizacji (nikt inny z nich nie korzysta)
+        shutil.rmtree(SHARDS_DIR, ignore_errors=True)
+        print("Osadzenia zostały zaktualizowane i zapisane")
+
+    def _convert_legacy_matrix(self):
+        """Przepisuje macierz z pliku .joblib do formatu EmbeddingStore"""
+        try:
+            print("Konwersja osadzeń z formatu joblib...")
+            matrix = joblib.load(self.legacy_matrix_path)
+
+            # Skróty treści z bazy, z której wygenerowano macierz
+            conn = pool.connection()
+            ids, hashes = [], []
+
+            for nct_id, title, summary, _ in iter_trial_rows(conn):
+                ids.append(nct_id)
+                hashes.append(text_hash(passage_text(title, summary)))
+
+            if len(ids) != len(matrix):
+                print("Liczba wierszy bazy nie zgadza się z macierzą, pominięto")
+                return
+
+            EmbeddingStore.write(
+                self.store_path,
+                ids,
+                matrix.cpu().numpy(),
+                dtype=STORE_DTYPE,
+                hashes=hashes,
+            )
+        except Exception as e:
+            print(f"Błąd konwersji osadzeń: {e}")
+
+    def _load_facets(self):
+        """Ładuje mapy bitowe filtrów lub buduje je, gdy baza lub osadzenia się zmieniły"""
+        if self.store is None:
+            return
+
+        try:
+            meta = {"store": self.store.version, "source": database_fingerprint()}
+
+            if os.path.exists(self.facets_path):
+                facets = FacetIndex.load(self.facets_path)
+
+                if facets.meta == meta and facets.n_rows == len(self.store):
+                    self.facets = facets
+                    return
+
+            print("Budowanie map bitowych filtrów...")
+            conn = pool.connection()
+            ids = self.store.id_list(range(len(self.store)))
+            self.facets = FacetIndex.build(conn, ids, meta=meta)
+
+            self.facets.save(self.facets_path)
+        except Exception as e:
+            print(f"Błąd map bitowych, filtry będą stosowane w SQL: {e}")
+            self.facets = None
+
+    def _load_neighbors(self):
+        """Ładuje graf podobnych badań, jeśli odpowiada bieżącym osadzeniom"""
+        if self.store is None or not os.path.exists(
+            NeighborGraph.paths(self.models_dir)["keys"]
+        ):
             return
 
         try:
-            print("Generowanie osadzeń...")
-            conn = sqlite3.connect(DATABASE)
-            full_df = pd.read_sql(
-                'SELECT "NCT Number", "Study Title", "Brief Summary", "Conditions" FROM trials',
-                conn,
+            graph = NeighborGraph.load(self.models_dir)
+
+            if graph.matches(self.store):
+                self.neighbors = graph
+            else:
+                print("Graf podobnych badań jest nieaktualny (build_neighbors.py)")
+        except Exception as e:
+            print(f"Błąd grafu podobnych badań: {e}")
+
+    def _load_index(self):
+        """Ładuje indeks IVF z dysku lub buduje go z macierzy osadzeń"""
+        if self.store is None:
+            return
+
+        try:
+            if os.path.exists(self.index_path) and os.path.getmtime(
+                self.index_path
+            ) >= os.path.getmtime(self.store_path):
+                index = IVFIndex.load(self.index_path)
+
+                if index.n_rows == len(self.store):
+                    self.index = index
+                    return
+
+            self.build_index()
+        except Exception as e:
+            print(f"Błąd indeksu IVF, używane jest pełne przeszukanie: {e}")
+            self.index = None
+
+    def build_index(self, n_lists=None):
+        """Buduje indeks IVF z macierzy osadzeń i zapisuje go obok niej"""
+        print("Budowanie indeksu IVF...")
+        self.index = IVFIndex.build(self.store.vectors(), n_lists=n_lists)
+        self.index.save(self.index_path)
+        print(f"Indeks IVF gotowy ({self.index.n_lists} list)")
+
+    def get_relevant_ids(
+        self, query_text, top_n=100, exact=False, n_probe=None, mode=None
+    ):
+        """Numery NCT najlepszych wyników (tryb rankingu: SEARCH_MODE lub `mode`)"""
+        ids, _ = self.search(query_text, top_n, exact=exact, n_probe=n_probe, mode=mode)
+        return ids
+
+    def search(
+        self, query_text, top_n=100, exact=False, n_probe=None, filters=None, mode=None
+    ):
+        """Zwraca numery NCT i wyniki najlepszych badań w kolejności rankingu
+
+        Filtry (status, faza, typ, wiek, płeć) są nakładane przed wyborem top-N,
+        więc wynik to najlepsze badania spośród spełniających filtry.
+        """
+        ids, scores, _ = self._search(
+            query_text, top_n, exact, n_probe, filters, mode=mode
+        )
+        return ids, scores
+
+    def search_with_facets(self, query_text, filters=None, top_n=100):
+        """Wyniki wyszukiwania oraz liczności filtrów w jednym przebiegu
+
+        Liczność wartości filtra to liczba wyników, które zwróci wyszukiwanie
+        po jej zaznaczeniu: min(`top_n`, wiersze spełniające filtry) w rankingu
+        semantycznym, a dla rankingu BM25 i numerów NCT - ich kandydaci.
+        """
+        return self._search(query_text, top_n, filters=filters, with_facets=True)
+
+    def search_batch(self, queries, top_n=100, filters=None, mode=None):
+        """Wyszukuje wiele zapytań w jednym przebiegu (np. dopasowanie profili pacjentów)
+
+        Zapytania są kodowane wsadowo i oceniane iloczynem macierzy na pełnej
+        macierzy osadzeń. `filters` to wspólne filtry albo lista filtrów dla
+        każdego zapytania. Zwraca listę par (numery NCT, wyniki) w kolejności zapytań.
+
+        Domyślny tryb to "semantic". Wyniki to podobieństwo cosinusowe (także
+        w trybie "hybrid", gdzie o kolejności decyduje fuzja rang), więc można je
+        progować i porównywać między zapytaniami; w trybie "lexical" - BM25.
+        """
+        mode = mode or "semantic"
+        results = [([], []) for _ in queries]
+
+        if isinstance(filters, list):
+            query_filters = filters
+        else:
+            query_filters = [filters] * len(queries)
+
+        positions = [i for i, q in enumerate(queries) if q and q.strip()]
+
+        if not positions or self.store is None:
+            return results
+
+        if mode == "lexical":
+            for i in positions:
+                ids, scores = self.search(
+                    queries[i], top_n, filters=query_filters[i], mode="lexical"
+                )
+                results[i] = (ids, scores)
+
+            return results
+
+        # Zapamiętane wektory zapytań; pozostałe kodowane jednym wywołaniem modelu
+        keys = [normalize_query(queries[i]) for i in positions]
+        version = self.store.version
+        vectors = [self.memo.get("vector", key, version) for key in keys]
+        missing = [n for n, vector in enumerate(vectors) if vector is None]
+
+        if missing:
+            with timed("encode"):
+                encoded = self.query_encoder.encode(
+                    [f"query: {keys[n]}" for n in missing],
+                    batch_size=ENCODE_BATCH_SIZE,
+                    normalize_embeddings=True,
+                )
+
+            for n, vector in zip(missing, encoded):
+                vectors[n] = vector
+                self.memo.put("vector", keys[n], version, np.array(vector))
+
+        query_vecs = np.asarray(vectors)
+
+        # Zapytania o tych samych filtrach oceniane są wspólną maską
+        groups = {}
+        for n, i in enumerate(positions):
+            key = repr(sorted((query_filters[i] or {}).items()))
+            groups.setdefault(key, []).append(n)
+
+        for members in groups.values():
+            group_filters = query_filters[positions[members[0]]]
+            mask = None
+            if group_filters and self.facets is not None:
+                mask = self.facets.mask(group_filters)
+
+            for start in range(0, len(members), QUERY_BATCH_SIZE):
+                chunk = members[start : start + QUERY_BATCH_SIZE]
+
+                with timed("score"):
+                    rows, scores = self.store.top_k_batch(
+                        query_vecs[chunk], top_n, mask=mask
+                    )
+
+                for n, row_list, score_list in zip(chunk, rows, scores):
+                    ranked = list(zip(row_list.tolist(), score_list.tolist()))
+
+                    if mode == "hybrid":
+                        # Fuzja rang z wynikami BM25 (jak w pojedynczym wyszukiwaniu)
+                        eligible = [
+                            r
+                            for r, _ in self._lexical_rows(
+                                queries[positions[n]], filters=group_filters
+                            )
+                        ]
+                        fused = reciprocal_rank_fusion(
+                            [[r for r, _ in ranked], eligible]
+                        )[:top_n]
+
+                        # Kolejność z fuzji, wynik - podobieństwo cosinusowe
+                        # (dla wierszy spoza rankingu semantycznego liczone osobno)
+                        cosine = dict(ranked)
+                        missing = [r for r, _ in fused if r not in cosine]
+
+                        if missing:
+                            scores = self.store.vectors(missing) @ query_vecs[n]
+                            cosine.update(zip(missing, scores.tolist()))
+
+                        ranked = [(r, cosine[r]) for r, _ in fused]
+
+                    results[positions[n]] = (
+                        self.store.id_list([r for r, _ in ranked]),
+                        [float(s) for _, s in ranked],
+                    )
+
+        return results
+
+    def _search(
+        self,
+        query_text,
+        top_n=100,
+        exact=False,
+        n_probe=None,
+        filters=None,
+        with_facets=False,
+        mode=None,
+    ):
+        if not query_text or self.store is None:
+            return [], [], None
+
+        mode = mode or SEARCH_MODE
+
+        try:
+            # Maska wierszy spełniających filtry
+            mask = None
+            if filters and self.facets is not None:
+                mask = self.facets.mask(filters)
+
+            nct_ids = parse_nct_ids(query_text)
+
+            # Krótkie zapytania (skróty, nazwy) pomijają model tylko wtedy, gdy
+            # BM25 znalazł kandydatów - inaczej (np. "rak") ranking semantyczny
+            is_short = (
+                len(query_text.split()) == 1
+                and len(query_text.strip()) <= SHORT_QUERY_LENGTH
+                and bool(self._lexical_rows(query_text))
             )
-            conn.close()
 
-            # Przygotowanie tekstu
-            full_df["Combined Text"] = (
-                full_df["Study Title"].fillna("")
-                + " "
-                + full_df["Brief Summary"].fillna("")
+            if nct_ids is not None:
+                # Numery NCT - bezpośrednie odwołanie do wierszy, bez modelu
+                rows = [r for r in map(self.store.position, nct_ids) if r is not None]
+                ranked = [(r, 1.0) for r in rows]
+                facet_rows = rows
+                facet_limit = top_n
+            elif mode == "lexical" or (mode == "hybrid" and is_short):
+                # Krótkie zapytania (skróty, nazwy) - wyłącznie ranking BM25
+                # zawężony filtrami w SQL; liczności ze wszystkich dopasowań
+                ranked = self._lexical_rows(query_text, filters=filters)
+                facet_rows = self._match_rows(query_text) if with_facets else None
+                facet_limit = min(top_n, LEXICAL_CANDIDATES)
+            else:
+                # Ranking obejmuje wszystkie wiersze spełniające filtry
+                indices, scores = self._semantic_rows(
+                    query_text, top_n, exact, n_probe, mask
+                )
+                ranked = list(zip(indices, scores))
+                facet_rows = None
+                facet_limit = top_n
+
+                if mode == "hybrid":
+                    # Fuzja rang wyników semantycznych i BM25
+                    eligible = [
+                        r for r, _ in self._lexical_rows(query_text, filters=filters)
+                    ]
+                    ranked = reciprocal_rank_fusion([list(indices), eligible])
+
+            ranked = [(r, s) for r, s in ranked if mask is None or mask[r]][:top_n]
+
+            # Liczności liczone tak jak lista wyników: kandydaci zawężeni
+            # filtrami i obcięci do top_n
+            counts = None
+            if with_facets and self.facets is not None:
+                if facet_rows is not None:
+                    facet_rows = np.asarray(facet_rows, dtype=np.int64)
+
+                with timed("facets"):
+                    counts = self.facets.counts(
+                        filters, rows=facet_rows, limit=facet_limit
+                    )
+
+            ids = self.store.id_list([r for r, _ in ranked])
+            return ids, [float(s) for _, s in ranked], counts
+        except Exception as e:
+            print(f"Błąd wyszukiwania: {e}")
+            return [], [], None
+
+    def _lexical_rows(self, query_text, limit=LEXICAL_CANDIDATES, filters=None):
+        """Ranking BM25 jako lista (pozycja wiersza, wynik)
+
+        Filtry zawężają wyszukiwanie w SQL, więc `limit` najlepszych wyników
+        pochodzi wyłącznie z wierszy spełniających filtry.
+        """
+        filters = {
+            key: values
+            for key, values in (filters or {}).items()
+            if key in FACET_KEYS and values
+        }
+        key = (normalize_query(query_text), limit, repr(sorted(filters.items())))
+        version = self.store.version
+        rows = self.memo.get("bm25", key, version)
+
+        if rows is not None:
+            return rows
+
+        rows = []
+
+        with timed("bm25"):
+            matches = fetch_bm25(pool.connection(), query_text, limit, filters=filters)
+
+        for nct_id, score in matches:
+            row = self.store.position(nct_id)
+
+            if row is not None:
+                rows.append((row, score))
+
+        self.memo.put("bm25", key, version, rows)
+
+        return rows
+
+    def _match_rows(self, query_text):
+        """Pozycje wszystkich wierszy dopasowanych przez BM25 (do liczności filtrów)"""
+        key = normalize_query(query_text)
+        version = self.store.version
+        rows = self.memo.get("matches", key, version)
+
+        if rows is None:
+            with timed("bm25"):
+                matches = fetch_matches(pool.connection(), query_text)
+
+            rows = np.array(
+                [r for r in map(self.store.position, matches) if r is not None],
+                dtype=np.int64,
             )
+            self.memo.put("matches", key, version, rows)
+
+        return rows
+
+    def _query_vector(self, query_text):
+        """Wektor zapytania (zapamiętywany dla znormalizowanego tekstu)"""
+        key = normalize_query(query_text)
+        version = self.store.version
+        query_vec = self.memo.get("vector", key, version)
+
+        if query_vec is None:
+            with timed("encode"):
+                query_vec = self.query_encoder.encode(
+                    f"query: {key}", normalize_embeddings=True
+                )
+
+            self.memo.put("vector", key, version, query_vec)
+
+        return query_vec
+
+    def _semantic_rows(self, query_text, top_n, exact, n_probe, mask):
+        """Ranking cosinusowy: pozycje wierszy i podobieństwa"""
+        query_vec = self._query_vector(query_text)
+
+        if top_n > MEMO_CANDIDATES or not self.memo.enabled:
+            with timed("score"):
+                return self._score_rows(query_vec, top_n, exact, n_probe, mask)
+
+        # Zapamiętany ranking bez filtrów (MEMO_CANDIDATES najlepszych wierszy)
+        use_index = self.index is not None and not exact
+        key = (
+            normalize_query(query_text),
+            use_index,
+            (n_probe or IVF_N_PROBE) if use_index else None,
+        )
+        version = self.store.version
+        candidates = self.memo.get("ranking", key, version)
 
-            # Słownik podpowiedzi
-            self.unique_conditions = list(
-                set(
-                    full_df["Conditions"]
-                    .str.split("|")
-                    .explode()
-                    .str.strip("., ")
-                    .str.capitalize()
-                    .dropna()
+        with timed("score"):
+            if candidates is None:
+                rows, scores = self._score_rows(
+                    query_vec, MEMO_CANDIDATES, exact, n_probe, None
+                )
+                candidates = (
+                    np.asarray(rows, dtype=np.int64),
+                    np.asarray(scores, dtype=np.float32),
                 )
+                self.memo.put("ranking", key, version, candidates)
+
+            rows, scores = candidates
+
+            if mask is None:
+                return rows[:top_n], scores[:top_n]
+
+            # Filtry zawężają zapamiętanych kandydatów, a gdy jest ich za mało,
+            # macierz przeszukiwana jest z maską
+            eligible = mask[rows]
+
+            if eligible.sum() >= top_n or len(rows) == len(self.store):
+                return rows[eligible][:top_n], scores[eligible][:top_n]
+
+            return self._score_rows(query_vec, top_n, exact, n_probe, mask)
+
+    def _score_rows(self, query_vec, top_n, exact, n_probe, mask):
+        """Wybór najlepszych wierszy: indeks IVF lub pełne przeszukanie macierzy"""
+        indices = None
+        if self.index is not None and not exact:
+            # Przeszukanie wybranych list indeksu IVF
+            n_probe = n_probe or IVF_N_PROBE
+            indices, scores = self.index.search(
+                self.store, query_vec, top_n=top_n, n_probe=n_probe, mask=mask
             )
 
-            # Generowanie osadzeń
-            sentences = [
-                "passage: " + text for text in full_df["Combined Text"].tolist()
-            ]
-            self.matrix = self.model.encode(sentences, convert_to_tensor=True)
-            self.df = full_df[["NCT Number"]]
-
-            # Zapisanie na dysk
-            joblib.dump(self.matrix, self.matrix_path)
-            joblib.dump(self.unique_conditions, self.conditions_path)
-            print("Osadzenia zostały wygenerowane i zapisane")
-        except Exception as e:
-            print(f"Błąd podczas generowania osadzeń: {e}")
-            self.df = pd.DataFrame()
+            # Zbyt mało kandydatów po filtrach - pełne przeszukanie
+            if mask is not None and len(indices) < top_n:
+                indices = None
 
-    def get_relevant_ids(self, query_text, top_n=100):
-        """Wyszukiwanie semantyczne (miara cosinusowa)"""
-        if not query_text or self.matrix is None:
-            return []
+        if indices is None:
+            # Podobieństwo cosinusowe liczone równolegle w shardach macierzy
+            indices, scores = self.store.top_k_sharded(
+                query_vec,
+                top_n,
+                mask=mask,
+                executor=self.executor,
+                shard_rows=SEARCH_SHARD_ROWS,
+            )
 
-        try:
-            # Zwektoryzowanie zapytania
-            query_with_prefix = f"query: {query_text}"
-            query_vec = self.model.encode(query_with_prefix, convert_to_tensor=True)
+        return indices, scores
 
-            # Obliczenie podobieństwa cosinusowego
-            cosine_scores = util.cos_sim(query_vec, self.matrix)[0]
+    def similar(self, nct_id, top_n=10):
+        """Badania najbardziej podobne do wskazanego (numery NCT i podobieństwa)
 
-            # Pobranie indeksów najlepszych wyników
-            top_results = torch.topk(cosine_scores, k=min(top_n, len(cosine_scores)))
-            indices = top_results.indices.tolist()
+        Bez aktualnego grafu sąsiedzi liczeni są przeszukaniem całej macierzy.
+        """
+        row = self.store.position(nct_id) if self.store is not None else None
 
-            return self.df.iloc[indices]["NCT Number"].tolist()
-        except Exception as e:
-            print(f"Błąd wyszukiwania semantycznego: {e}")
-            return []
+        if row is None:
+            return None
+
+        if self.neighbors is not None:
+            rows, scores = self.neighbors.neighbors(row, top_n)
+        else:
+            cosine_scores = self.store.scores(self.store.vectors([row])[0])
+            cosine_scores[row] = -np.inf
+            rows = top_k(cosine_scores, top_n)
+            scores = cosine_scores[rows]
+
+        return self.store.id_list(rows), [float(s) for s in scores]
 
     def get_suggestion(self, query_text):
         """Zwraca sugestię poprawki (odległość Levenshteina)"""
         if not query_text or not self.unique_conditions:
             return None
 
+        # Zawężenie słownika do kandydatów z indeksu trigramów
+        candidates = self.suggestions.candidates(query_text, limit=SUGGESTION_CANDIDATES)
+
+        if not candidates:
+            return None
+
         # Znalezienie najlepszego dopasowania
         best_match, score = process.extractOne(
-            query_text, self.unique_conditions, scorer=fuzz.WRatio
+            query_text, candidates, scorer=fuzz.WRatio
         )
 
         # Przedział punktowy dla sugestii literówek
@@ -126,4 +771,87 @@ class SearchEngine:
         return None
 
 
-search_engine = SearchEngine()
+class EngineWarmup:
+    """Tworzy silnik wyszukiwania w wątku w tle i udostępnia stan rozgrzewania
+
+    Rozgrzewanie uruchamia się osobno w każdym procesie (np. w procesach
+    roboczych gunicorna po fork); stan odziedziczony po procesie nadrzędnym
+    jest pomijany, bo jego wątek nie istnieje w procesie potomnym.
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self.engine = None
+        self.state = "idle"
+        self.stage = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def start(self):
+        """Uruchamia tworzenie silnika (tylko raz w danym procesie)"""
+        if self._pid != os.getpid():
+            self._reset()
+
+        with self._lock:
+            if self.state != "idle":
+                return
+
+            self.state = "loading"
+            self.started_at = time.time()
+
+        threading.Thread(target=self._run, name="search-warmup", daemon=True).start()
+
+    def _run(self):
+        try:
+            engine = SearchEngine(progress=self._set_stage)
+
+            # Bez osadzeń silnik zwracałby puste wyniki; wyszukiwanie pozostaje
+            # przy rankingu BM25, a /readyz zgłasza błąd
+            if engine.store is None:
+                raise RuntimeError("Nie udało się wczytać ani zbudować osadzeń")
+
+            self.engine = engine
+            self.state = "ready"
+        except Exception as e:
+            print(f"Błąd inicjalizacji silnika wyszukiwania: {e}")
+            self.error = str(e)
+            self.state = "failed"
+        finally:
+            self.finished_at = time.time()
+            self._done.set()
+
+    def _set_stage(self, stage):
+        self.stage = stage
+
+    @property
+    def ready(self):
+        return self.engine is not None
+
+    def wait(self, timeout=None):
+        """Uruchamia rozgrzewanie i czeka na silnik"""
+        self.start()
+        self._done.wait(timeout)
+
+        return self.engine
+
+    def status(self):
+        """Stan rozgrzewania do raportowania w punktach kontrolnych"""
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+
+        return {
+            "state": self.state,
+            "stage": self.stage,
+            "elapsed_s": round(elapsed, 2),
+            "error": self.error,
+            "memo": self.engine.memo.stats() if self.engine is not None else None,
+        }
+
+
+search_warmup = EngineWarmup()
@@ -0,0 +1,120 @@
+import datetime
+
+from services.database import build_search_query
+from services.metrics import timed
+
+PHASES = ["EARLY_PHASE1", "PHASE1", "PHASE2", "PHASE3", "PHASE4"]
+
+# Zapytania agregujące; {subset} zawęża wiersze tabeli trials
+TIMELINE_SQL = """
+    SELECT CAST(substr("Start Date", 1, 4) AS INTEGER) AS "Year",
+           "Study Type", COUNT(*) AS "Count"
+    FROM trials WHERE {subset}
+    GROUP BY 1, 2
+"""
+
+PHASES_SQL = """
+    SELECT "Phase", COUNT(*) AS "Count"
+    FROM trial_phases WHERE {subset_ids}
+    GROUP BY 1
+"""
+
+ENROLLMENT_SQL = """
+    SELECT CASE WHEN "Enrollment" < 100 THEN 0
+                WHEN "Enrollment" <= 500 THEN 1
+                ELSE 2 END AS "Bucket",
+           COUNT(*) AS "Count"
+    FROM trials WHERE {subset} AND "Enrollment" IS NOT NULL
+    GROUP BY 1
+"""
+
+CONDITIONS_SQL = """
+    SELECT "Condition", COUNT(*) AS "Count"
+    FROM trial_conditions WHERE {subset_ids}
+    GROUP BY 1
+"""
+
+STATS_TABLES = {
+    "stats_timeline": TIMELINE_SQL,
+    "stats_phases": PHASES_SQL,
+    "stats_enrollment": ENROLLMENT_SQL,
+    "stats_conditions": CONDITIONS_SQL,
+}
+
+
+def _subset_sql(sql, where_clause):
+    return sql.format(
+        subset=where_clause,
+        subset_ids=f'"NCT Number" IN (SELECT "NCT Number" FROM trials WHERE {where_clause})',
+    )
+
+
+def build_stats_tables(conn):
+    """Materializuje agregaty dla pełnego zbioru danych (w transakcji ładowania bazy)"""
+    for table, sql in STATS_TABLES.items():
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute(f"CREATE TABLE {table} AS {_subset_sql(sql, '1=1')}")
+
+    conn.execute(
+        'CREATE INDEX idx_stats_conditions_count ON stats_conditions ("Count" DESC)'
+    )
+
+
+def has_active_filters(filters):
+    """Sprawdza, czy wybrano jakikolwiek filtr wyszukiwania"""
+    return any(filters.values())
+
+
+def fetch_stats(conn, filters=None, matching_ids=None, top_conditions=10):
+    """Zwraca surowe agregaty: z tabel podsumowań lub dla przefiltrowanego podzbioru"""
+    if filters and has_active_filters(filters):
+        where_clause, params = build_search_query(filters, matching_ids)
+
+        def run(table, order=""):
+            sql = _subset_sql(STATS_TABLES[table], where_clause) + order
+            return conn.execute(sql, params).fetchall()
+
+    else:
+
+        def run(table, order=""):
+            return conn.execute(f"SELECT * FROM {table} {order}").fetchall()
+
+    conditions_order = f' ORDER BY "Count" DESC LIMIT {int(top_conditions)}'
+
+    with timed("stats_query"):
+        return {
+            "timeline": run("stats_timeline"),
+            "phases": run("stats_phases"),
+            "enrollment": run("stats_enrollment"),
+            "conditions": run("stats_conditions", conditions_order),
+        }
+
+
+def timeline_chart(rows, types_map):
+    """Przygotowuje dane wykresu liczby rozpoczętych badań w latach"""
+    current_year = datetime.date.today().year
+    totals = {}
+    details = {}
+    types = set()
+
+    for year, study_type, count in rows:
+        if not year or not (1950 < year <= current_year + 5):
+            continue
+
+        totals[year] = totals.get(year, 0) + count
+
+        if study_type:
+            label = types_map.get(study_type, study_type)
+            types.add(label)
+            year_details = details.setdefault(year, {})
+            year_details[label] = year_details.get(label, 0) + count
+
+    years = sorted(totals)
+    timeline_details = {
+        str(year): {
+            label: details.get(year, {}).get(label, 0) for label in sorted(types)
+        }
+        for year in years
+    }
+
+    return [str(year) for year in years], [totals[y] for y in years], timeline_details
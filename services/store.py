@@ -0,0 +1,305 @@
+import heapq
+import itertools
+import json
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b"CSEMB\x00\x00\x01"
+FORMAT_VERSION = 2
+ALIGNMENT = 64
+
+
+class EmbeddingStore:
+    """Skwantyzowana macierz osadzeń odczytywana z dysku przez numpy.memmap
+
+    Układ pliku: MAGIC, długość nagłówka (uint32), nagłówek JSON, a następnie
+    wyrównane sekcje (macierz, skale wierszy, identyfikatory NCT, skróty treści).
+    """
+
+    def __init__(self, path, header, sections, version=None):
+        self.path = path
+        self.version = version
+        self.header = header
+        self.dtype = header["dtype"]
+        self.dim = header["dim"]
+        self.matrix = sections["matrix"]
+        self.scales = sections.get("scales")
+        self.ids = sections["ids"]
+        self.hashes = sections.get("hashes")
+        self.meta = header.get("meta", {})
+        self._positions = None
+
+    def __len__(self):
+        return self.header["n_rows"]
+
+    @classmethod
+    def open(cls, path):
+        """Otwiera plik bez kopiowania danych do pamięci procesu
+
+        Sekcje są mapowane z tego samego deskryptora, z którego odczytano
+        wersję (czas modyfikacji i rozmiar), więc wersja opisuje dane
+        zmapowane w procesie, nawet jeśli plik zostanie później podmieniony.
+        """
+        sections = {}
+
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Nieprawidłowy plik osadzeń: {path}")
+
+            (header_len,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_len))
+            stat = os.fstat(f.fileno())
+
+            for name, (offset, dtype, shape) in header["sections"].items():
+                if 0 in shape:
+                    sections[name] = np.empty(shape, dtype=dtype)
+                else:
+                    sections[name] = np.memmap(
+                        f, dtype=dtype, mode="r", offset=offset, shape=tuple(shape)
+                    )
+
+        return cls(path, header, sections, f"{stat.st_mtime_ns}-{stat.st_size}")
+
+    @classmethod
+    def write(cls, path, ids, vectors, dtype="int8", hashes=None, meta=None):
+        """Kwantyzuje wektory i zapisuje je atomowo pod wskazaną ścieżką"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors = vectors / np.maximum(
+            np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12
+        )
+        ids = np.asarray([str(i).encode() for i in ids])
+
+        if len(ids) == 0:
+            ids = np.empty(0, dtype="S1")
+
+        arrays = {}
+
+        if dtype == "int8":
+            # Skala per wiersz: największa wartość bezwzględna mapowana na 127
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            arrays["matrix"] = np.round(vectors / scales[:, None]).astype(np.int8)
+            arrays["scales"] = scales.astype(np.float32)
+        elif dtype == "float16":
+            arrays["matrix"] = vectors.astype(np.float16)
+        else:
+            raise ValueError(f"Nieobsługiwany typ danych: {dtype}")
+
+        arrays["ids"] = ids
+
+        if hashes is not None:
+            joined = b"".join(hashes)
+            arrays["hashes"] = np.frombuffer(joined, dtype=np.uint8).reshape(
+                len(hashes), len(joined) // max(len(hashes), 1)
+            )
+
+        # Wyliczenie przesunięć sekcji
+        header = {
+            "version": FORMAT_VERSION,
+            "n_rows": len(vectors),
+            "dim": vectors.shape[1] if vectors.ndim == 2 else 0,
+            "dtype": dtype,
+            "meta": meta or {},
+            "sections": {},
+        }
+        header_len = 4096
+        offset = _align(len(MAGIC) + 4 + header_len)
+
+        for name, array in arrays.items():
+            header["sections"][name] = [offset, array.dtype.str, list(array.shape)]
+            offset = _align(offset + array.nbytes)
+
+        header_bytes = json.dumps(header).encode()
+
+        if len(header_bytes) > header_len:
+            raise ValueError("Nagłówek pliku osadzeń jest zbyt duży")
+
+        header_bytes = header_bytes.ljust(header_len)
+
+        # Zapis do pliku tymczasowego i podmiana
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", header_len))
+            f.write(header_bytes)
+
+            for name, array in arrays.items():
+                f.seek(header["sections"][name][0])
+                f.write(np.ascontiguousarray(array).tobytes())
+
+            f.truncate(max(offset, f.tell()))
+
+        os.replace(tmp_path, path)
+
+        return cls.open(path)
+
+    def row_hash(self, row):
+        """Skrót treści wiersza (lub None, jeśli plik go nie zawiera)"""
+        if self.hashes is None:
+            return None
+
+        return self.hashes[row].tobytes()
+
+    def id_list(self, rows):
+        """Zamienia pozycje wierszy na numery NCT"""
+        return [self.ids[i].decode() for i in rows]
+
+    def position(self, nct_id):
+        """Zwraca pozycję wiersza dla numeru NCT (lub None)"""
+        if self._positions is None:
+            self._positions = {v.decode(): i for i, v in enumerate(self.ids)}
+
+        return self._positions.get(nct_id)
+
+    def vectors(self, rows=None):
+        """Zwraca zdekwantyzowane wektory (float32) wskazanych wierszy"""
+        if rows is None:
+            rows = slice(None)
+
+        block = np.asarray(self.matrix[rows], dtype=np.float32)
+
+        if self.scales is not None:
+            block *= np.asarray(self.scales[rows])[:, None]
+
+        return block
+
+    def scores(self, query_vec, chunk_size=32768):
+        """Podobieństwo cosinusowe zapytania do wszystkich wierszy, liczone blokami"""
+        query_vec = np.asarray(query_vec, dtype=np.float32).ravel()
+        query_vec = query_vec / max(float(np.linalg.norm(query_vec)), 1e-12)
+        scores = np.empty(len(self), dtype=np.float32)
+
+        for start in range(0, len(self), chunk_size):
+            end = min(start + chunk_size, len(self))
+            block = np.asarray(self.matrix[start:end], dtype=np.float32)
+            scores[start:end] = block @ query_vec
+
+        if self.scales is not None:
+            scores *= self.scales
+
+        return scores
+
+    def shard_top_k(self, query_vec, k, start, end, mask=None):
+        """Najlepsze wiersze zakresu [start, end) macierzy (jednego shardu)
+
+        Zwraca pozycje i podobieństwa w kolejności malejącej.
+        """
+        block = np.asarray(self.matrix[start:end], dtype=np.float32)
+        scores = block @ query_vec
+
+        if self.scales is not None:
+            scores *= np.asarray(self.scales[start:end])
+
+        if mask is not None:
+            scores[~mask[start:end]] = -np.inf
+
+        top = top_k(scores, k)
+        top = top[np.isfinite(scores[top])]
+
+        return top + start, scores[top]
+
+    def top_k_sharded(self, query_vec, k, mask=None, executor=None, shard_rows=32768):
+        """Najlepsze wiersze całej macierzy: shardy oceniane równolegle, scalane kopcem
+
+        Zwraca pozycje i podobieństwa w kolejności malejącej.
+        """
+        query_vec = np.asarray(query_vec, dtype=np.float32).ravel()
+        query_vec = query_vec / max(float(np.linalg.norm(query_vec)), 1e-12)
+        shards = [
+            (start, min(start + shard_rows, len(self)))
+            for start in range(0, len(self), shard_rows)
+        ]
+
+        def score(shard):
+            return self.shard_top_k(query_vec, k, *shard, mask=mask)
+
+        if executor is None or len(shards) < 2:
+            results = [score(shard) for shard in shards]
+        else:
+            results = list(executor.map(score, shards))
+
+        return _merge_top_k(results, k)
+
+    def top_k_batch(self, query_matrix, k, mask=None, chunk_size=32768):
+        """Najlepsze wiersze dla wielu zapytań naraz (iloczyn macierzy liczony blokami)
+
+        Pamięć ograniczona jest do bloku wyników (zapytania x chunk_size) oraz
+        k kandydatów na zapytanie. Zwraca macierze pozycji i podobieństw (zapytania x k).
+        """
+        queries = np.atleast_2d(np.asarray(query_matrix, dtype=np.float32))
+        queries = queries / np.maximum(
+            np.linalg.norm(queries, axis=1, keepdims=True), 1e-12
+        )
+        n_eligible = len(self) if mask is None else int(mask.sum())
+        k = min(k, n_eligible)
+
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+
+        if k <= 0:
+            return best_rows, best_scores
+
+        for start in range(0, len(self), chunk_size):
+            end = min(start + chunk_size, len(self))
+            block = np.asarray(self.matrix[start:end], dtype=np.float32)
+            scores = queries @ block.T
+
+            if self.scales is not None:
+                scores *= np.asarray(self.scales[start:end])
+
+            if mask is not None:
+                scores[:, ~mask[start:end]] = -np.inf
+
+            # Połączenie kandydatów bloku z dotychczasowymi najlepszymi wynikami
+            rows = np.broadcast_to(np.arange(start, end), scores.shape)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, rows], axis=1)
+
+            if best_scores.shape[1] > k:
+                top = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, top, axis=1)
+                best_rows = np.take_along_axis(best_rows, top, axis=1)
+
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+
+        return (
+            np.take_along_axis(best_rows, order, axis=1),
+            np.take_along_axis(best_scores, order, axis=1),
+        )
+
+
+def top_k(scores, k):
+    """Indeksy k najwyższych wyników w kolejności malejącej"""
+    k = min(k, len(scores))
+
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+
+    top = np.argpartition(-scores, k - 1)[:k]
+
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def _merge_top_k(shard_results, k):
+    """Scala posortowane malejąco listy shardów (kopiec) i zwraca k najlepszych"""
+    merged = list(
+        itertools.islice(
+            heapq.merge(
+                *(zip(scores.tolist(), rows.tolist()) for rows, scores in shard_results),
+                key=lambda pair: -pair[0],
+            ),
+            k,
+        )
+    )
+
+    return (
+        np.array([row for _, row in merged], dtype=np.int64),
+        np.array([score for score, _ in merged], dtype=np.float32),
+    )
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
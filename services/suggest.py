@@ -0,0 +1,64 @@
+from collections import defaultdict
+
+import numpy as np
+from thefuzz.utils import full_process
+
+
+class TrigramIndex:
+    """Odwrócony indeks trigramów znakowych do wyboru kandydatów podpowiedzi"""
+
+    def __init__(self, choices):
+        self.choices = list(choices)
+        self.lengths = np.zeros(len(self.choices), dtype=np.int32)
+        postings = defaultdict(list)
+
+        for i, choice in enumerate(self.choices):
+            processed = full_process(choice)
+            self.lengths[i] = len(processed)
+
+            for trigram in _trigrams(processed):
+                postings[trigram].append(i)
+
+        self.postings = {
+            trigram: np.asarray(rows, dtype=np.int32)
+            for trigram, rows in postings.items()
+        }
+
+    def __len__(self):
+        return len(self.choices)
+
+    def candidates(self, query, limit=50):
+        """Zwraca do `limit` pozycji słownika o największej liczbie wspólnych trigramów"""
+        processed = full_process(query)
+        lists = [
+            self.postings[t] for t in _trigrams(processed) if t in self.postings
+        ]
+
+        if not lists:
+            return []
+
+        counts = np.bincount(np.concatenate(lists), minlength=len(self.choices))
+        matched = np.flatnonzero(counts)
+
+        # Remisy rozstrzyga podobieństwo długości do zapytania
+        length_gap = np.minimum(np.abs(self.lengths[matched] - len(processed)), 999)
+        ranking = counts[matched].astype(np.int64) * 1000 - length_gap
+
+        if len(matched) > limit:
+            best = np.argpartition(-ranking, limit - 1)[:limit]
+        else:
+            best = np.arange(len(matched))
+
+        best = best[np.argsort(-ranking[best], kind="stable")]
+
+        return [self.choices[i] for i in matched[best]]
+
+
+def _trigrams(text):
+    """Zbiór trigramów tekstu z dopełnieniem spacjami na brzegach"""
+    if not text:
+        return set()
+
+    padded = f"  {text} "
+
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
@@ -0,0 +1,189 @@
+import os
+import sqlite3
+import hashlib
+import threading
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+
+# Trwały magazyn tłumaczeń (osobny plik, niezależny od przeładowań bazy badań)
+TRANSLATIONS_DATABASE = os.environ.get(
+    "TRANSLATIONS_DATABASE", os.path.join("instance", "translations.db")
+)
+
+# Dostawca tłumaczeń ("google" lub "stub" do pracy bez dostępu do sieci)
+TRANSLATE_BACKEND = os.environ.get("TRANSLATE_BACKEND", "google")
+TRANSLATE_WORKERS = int(os.environ.get("TRANSLATE_WORKERS", 4))
+MAX_TEXT_LENGTH = 5000
+
+
+def content_hash(text):
+    """Skrót treści tłumaczonego tekstu"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class TranslationBackend:
+    """Interfejs dostawcy tłumaczeń"""
+
+    name = None
+
+    def translate(self, text, target):
+        raise NotImplementedError
+
+
+class GoogleBackend(TranslationBackend):
+    """Tłumaczenie przez Google Translate (jeden tłumacz na wątek i język)"""
+
+    name = "google"
+
+    def __init__(self):
+        from deep_translator import GoogleTranslator
+
+        self._translator_class = GoogleTranslator
+        self._local = threading.local()
+
+    def _translator(self, target):
+        translators = getattr(self._local, "translators", None)
+
+        if translators is None:
+            translators = self._local.translators = {}
+
+        if target not in translators:
+            translators[target] = self._translator_class(source="auto", target=target)
+
+        return translators[target]
+
+    def translate(self, text, target):
+        return self._translator(target).translate(text)
+
+
+class StubBackend(TranslationBackend):
+    """Tłumaczenie zastępcze bez dostępu do sieci (do testów)"""
+
+    name = "stub"
+
+    def translate(self, text, target):
+        return f"[{target}] {text}"
+
+
+BACKENDS = {backend.name: backend for backend in [GoogleBackend, StubBackend]}
+
+
+class TranslationStore:
+    """Tłumaczenia w SQLite według skrótu treści i języka docelowego"""
+
+    def __init__(self, path=TRANSLATIONS_DATABASE):
+        self.path = path
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "hash TEXT NOT NULL, lang TEXT NOT NULL, text TEXT NOT NULL, "
+                "PRIMARY KEY (hash, lang)) WITHOUT ROWID"
+            )
+            conn.commit()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get_many(self, hashes, lang):
+        """Zwraca zapisane tłumaczenia dla podanych skrótów"""
+        hashes = list(hashes)
+        found = {}
+
+        with closing(self._connect()) as conn:
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                sql = (
+                    "SELECT hash, text FROM translations "
+                    f"WHERE lang = ? AND hash IN ({placeholders})"
+                )
+                found.update(conn.execute(sql, [lang] + chunk).fetchall())
+
+        return found
+
+    def put_many(self, translations, lang):
+        """Zapisuje tłumaczenia (skrót -> tekst)"""
+        if not translations:
+            return
+
+        with closing(self._connect()) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO translations (hash, lang, text) VALUES (?, ?, ?)",
+                [(h, lang, text) for h, text in translations.items()],
+            )
+            conn.commit()
+
+
+class Translator:
+    """Tłumaczy partie tekstów, korzystając z magazynu i puli wątków"""
+
+    def __init__(self, backend, store, workers=TRANSLATE_WORKERS):
+        self.backend = backend
+        self.store = store
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="translate"
+        )
+
+    def _translate_one(self, text, target):
+        try:
+            return self.backend.translate(text[:MAX_TEXT_LENGTH], target)
+        except Exception as e:
+            print(f"Błąd tłumaczenia: {e}")
+            return None
+
+    def translate_batch(self, batch, target="pl"):
+        """Tłumaczy słownik pól; powtarzające się teksty tłumaczone są raz"""
+        results = {}
+        hashes = {}
+
+        for key, text in batch.items():
+            if text and isinstance(text, str) and len(text.strip()) > 1:
+                hashes[key] = content_hash(text)
+            else:
+                results[key] = text
+
+        texts = {hashes[key]: batch[key] for key in hashes}
+        translated = self.store.get_many(texts, target)
+        missing = [h for h in texts if h not in translated]
+
+        # Brakujące tłumaczenia pobierane są równolegle
+        fresh = {}
+        for h, text in zip(
+            missing,
+            self.executor.map(
+                lambda t: self._translate_one(t, target), [texts[h] for h in missing]
+            ),
+        ):
+            if text is not None:
+                fresh[h] = text
+
+        self.store.put_many(fresh, target)
+        translated.update(fresh)
+
+        # Przy błędzie tłumaczenia zwracany jest tekst oryginalny
+        for key, h in hashes.items():
+            results[key] = translated.get(h, batch[key])
+
+        return results
+
+
+_translator = None
+_translator_lock = threading.Lock()
+
+
+def get_translator():
+    """Zwraca współdzielony tłumacz (tworzony przy pierwszym użyciu)"""
+    global _translator
+
+    with _translator_lock:
+        if _translator is None:
+            backend = BACKENDS[TRANSLATE_BACKEND]()
+            _translator = Translator(backend, TranslationStore())
+
+    return _translator
@@ -32,6 +32,25 @@ age_map = {"CHILD": "Dzieci", "ADULT": "Dorośli", "OLDER_ADULT": "Seniorzy"}
 
 sex_map = {"ALL": "Wszystkie", "FEMALE": "Kobiety", "MALE": "Mężczyźni"}
 
+sentiments_map = {
+    "POSITIVE": {
+        "label": "Obiecujący",
+        "class": "is-success is-light",
+        "icon": "fa-face-smile",
+    },
+    "NEGATIVE": {
+        "label": "Wymaga uwagi",
+        "class": "is-danger is-light",
+        "icon": "fa-triangle-exclamation",
+    },
+    "NEUTRAL": {
+        "label": "Neutralny",
+        "class": "is-white border-grey",
+        "icon": "fa-circle-info",
+    },
+    "NONE": {"label": "Neutralny", "class": "is-light", "icon": "fa-minus"},
+}
+
 statuses_colors_map = {
     # Pozytywne
     "APPROVED_FOR_MARKETING": "is-success is-light",
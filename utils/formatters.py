@@ -1,6 +1,3 @@
-from textblob import TextBlob
-
-
 def clean_text(text):
     """Czyści surowy tekst z separatorów i podkreślników"""
     if not text:
@@ -19,6 +16,25 @@ def clean_text(text):
     return text
 
 
+def split_values(text, separators=("|", "/", ",")):
+    """Rozdziela pole wielowartościowe na unikalne, niepuste elementy"""
+    if not text or not isinstance(text, str):
+        return []
+
+    for sep in separators[1:]:
+        text = text.replace(sep, separators[0])
+
+    values = []
+
+    for part in text.split(separators[0]):
+        part = part.strip()
+
+        if part and part not in values:
+            values.append(part)
+
+    return values
+
+
 def translate_complex_text(text, mapping):
     """Tłumaczy tekst używając mapowania, zachowując separatory"""
     if not text:
@@ -70,29 +86,20 @@ def clean_locations(text):
     return ", ".join(sorted(list(unique_countries)))
 
 
-def get_sentiment_info(text):
-    """Analizuje wydźwięk tekstu"""
+def get_sentiment_key(text):
+    """Klasyfikuje wydźwięk tekstu (klucz słownika sentiments_map)"""
     if not text or len(text) < 10:
-        return {"label": "Neutralny", "class": "is-light", "icon": "fa-minus"}
+        return "NONE"
+
+    # TextBlob (wraz z nltk) jest potrzebny tylko przy ładowaniu bazy
+    from textblob import TextBlob
 
     analysis = TextBlob(text)
     score = analysis.sentiment.polarity  # od -1.0 (negatywny) do 1.0 (pozytywny)
 
     if score > 0.1:
-        return {
-            "label": "Obiecujący",
-            "class": "is-success is-light",
-            "icon": "fa-face-smile",
-        }
+        return "POSITIVE"
     elif score < -0.1:
-        return {
-            "label": "Wymaga uwagi",
-            "class": "is-danger is-light",
-            "icon": "fa-triangle-exclamation",
-        }
+        return "NEGATIVE"
     else:
-        return {
-            "label": "Neutralny",
-            "class": "is-white border-grey",
-            "icon": "fa-circle-info",
-        }
+        return "NEUTRAL"